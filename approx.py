@@ -0,0 +1,269 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Sample fractions shown before the exact answer arrives (each sample contains the previous one)
+SAMPLE_STAGES = (0.01, 0.1)
+# Sketch-backed answers have a single approximate stage
+SKETCH_STAGES = (0.0,)
+# Never sample fewer rows than this from a stratum (whole stratum if smaller)
+MIN_PER_STRATUM = 30
+# 95% confidence half-width multiplier
+Z_95 = 1.96
+# Quantile sketch size (rank error ~ 2/k)
+SKETCH_K = 200
+# Rows kept per chunk by the mergeable top-k lists (the largest n top_n can answer)
+TOP_K_LIST = 100
+# Rows fed into a sketch at a time
+CHUNK_ROWS = 1_000_000
+
+
+# An aggregate that may come from a sample/sketch. `error` is a ±95% half-width
+# (same shape as `values`, or a scalar bound for sketches); fraction 1.0 = exact.
+class Estimate:
+    def __init__(self, values, error=0.0, fraction=1.0, note=""):
+        self.values = values
+        self.error = error
+        self.fraction = fraction
+        self.note = note
+
+    @property
+    def exact(self):
+        return self.fraction >= 1.0
+
+
+# Nested stratified samples built in O(rows), without sorting: every row gets a
+# fixed uniform priority, and a stratum's sample is its rows whose priority is
+# below the stratum's inclusion probability (raised so small strata still get
+# about MIN_PER_STRATUM rows). A larger fraction only raises the cut-off, so each
+# sample contains the smaller ones.
+class StratifiedSampler:
+    def __init__(self, df, strata, seed=0):
+        self.codes = np.zeros(len(df), dtype=np.int64)
+        self.levels = []
+        for column in strata:
+            codes, uniques = pd.factorize(df[column], sort=True)
+            uniques = list(uniques)
+            if (codes < 0).any():
+                codes = np.where(codes < 0, len(uniques), codes)
+                uniques.append(np.nan)
+            self.codes = self.codes * len(uniques) + codes
+            self.levels.append(np.array(uniques, dtype=object))
+        self.sizes = np.bincount(self.codes, minlength=int(np.prod([len(level) for level in self.levels])))
+        self.priority = np.random.default_rng(seed).random(len(df), dtype=np.float32)
+
+    # Value of strata[level] for every stratum code
+    def stratum_values(self, level):
+        radix = int(np.prod([len(inner) for inner in self.levels[level + 1:]]))
+        return self.levels[level][(np.arange(len(self.sizes)) // radix) % len(self.levels[level])]
+
+    # Row positions in the sample and per-stratum sample sizes
+    def take(self, fraction, min_per_stratum=MIN_PER_STRATUM):
+        probability = np.minimum(1.0, np.maximum(fraction, min_per_stratum / np.maximum(self.sizes, 1)))
+        rows = np.flatnonzero(self.priority < probability[self.codes])
+        return rows, np.bincount(self.codes[rows], minlength=len(self.sizes))
+
+
+# Mergeable quantile sketch (KLL-style compactors). Items at level h stand for 2**h values.
+class QuantileSketch:
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                keep = level[len(level) - len(level) % 2:]
+                promoted = level[self.rng.integers(2):len(level) - len(keep):2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        for start in range(0, len(values), CHUNK_ROWS):
+            chunk = values[start:start + CHUNK_ROWS]
+            self.n += len(chunk)
+            self.levels[0] = np.concatenate([self.levels[0], chunk])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        items, cum = self._weighted()
+        if not len(items):
+            return np.full(len(np.atleast_1d(qs)), np.nan)
+        pos = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+        return items[np.clip(pos, 0, len(items) - 1)]
+
+    # Fraction of values <= x
+    def cdf(self, xs):
+        items, cum = self._weighted()
+        if not len(items):
+            return np.zeros(len(np.atleast_1d(xs)))
+        pos = np.searchsorted(items, xs, side="right")
+        return np.where(pos > 0, cum[np.maximum(pos - 1, 0)], 0.0) / cum[-1]
+
+    # Approximate normalised rank error
+    def rank_error(self):
+        return 2.0 / self.k
+
+
+# Mergeable top-k lists: the best k rows of each chunk, merged by keeping the best
+# k of the union. The top n <= k rows of the whole column are always in the union,
+# so answers are exact. Rows are ranked by value descending, then `tiebreak`
+# ascending, then row position (the order nlargest/sort_values give).
+class TopKLists:
+    def __init__(self, k=TOP_K_LIST):
+        self.k = k
+        self.rows = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0)
+        self.tiebreak = np.empty(0)
+
+    def _keep_best(self, rows, values, tiebreak):
+        order = np.lexsort((rows, tiebreak, -values))[:self.k]
+        self.rows, self.values, self.tiebreak = rows[order], values[order], tiebreak[order]
+
+    def update(self, values, tiebreak=None, offset=0):
+        values = np.asarray(values, dtype=float)
+        tiebreak = np.zeros(len(values)) if tiebreak is None else np.asarray(tiebreak, dtype=float)
+        for start in range(0, len(values), CHUNK_ROWS):
+            chunk = values[start:start + CHUNK_ROWS]
+            valid = ~np.isnan(chunk)
+            if valid.sum() > self.k:
+                # Everything tied with the k-th largest value stays a candidate
+                cut = np.partition(chunk[valid], int(valid.sum()) - self.k)[int(valid.sum()) - self.k]
+                valid &= chunk >= cut
+            rows = np.flatnonzero(valid)
+            self._keep_best(np.concatenate([self.rows, rows + start + offset]),
+                            np.concatenate([self.values, chunk[rows]]),
+                            np.concatenate([self.tiebreak, tiebreak[start + rows]]))
+        return self
+
+    def merge(self, other):
+        self._keep_best(np.concatenate([self.rows, other.rows]),
+                        np.concatenate([self.values, other.values]),
+                        np.concatenate([self.tiebreak, other.tiebreak]))
+        return self
+
+
+# Approximate answers for the dashboard's aggregates over one products table.
+# Means and sums come from the stratified sample, distributions from sketches and
+# Top-N from mergeable top-k lists; exact answers are computed on a background
+# thread and memoised (failures are retried on the next request). Creating the
+# engine is cheap: the sampler (about 12 bytes per row) is only built once
+# start_sampling() or the first sampled answer asks for it.
+class ApproxEngine:
+    def __init__(self, df, group="manufacturer", strata=("manufacturer", "size"), seed=0):
+        if strata[0] != group:
+            raise ValueError("The first stratum column must be the reporting group")
+        self.df = df
+        self.group = group
+        self.strata = strata
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.sketches = {}
+        self.top_lists = {}
+        self.futures = {}
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="approx-exact")
+        self.sampler_future = None
+
+    # Start building the sampler in the background (no-op once started)
+    def start_sampling(self):
+        with self.lock:
+            if self.sampler_future is None:
+                self.sampler_future = self.executor.submit(StratifiedSampler, self.df, self.strata, self.seed)
+            return self.sampler_future
+
+    @property
+    def sampler(self):
+        return self.start_sampling().result()
+
+    # Per-group mean or sum of `column`; fraction None = exact
+    def group_stat(self, column, stat, fraction=None):
+        if fraction is None or fraction >= 1:
+            grouped = self.df.groupby(self.group, observed=True)[column]
+            values = grouped.mean() if stat == "mean" else grouped.sum()
+            return Estimate(values, pd.Series(0.0, index=values.index))
+
+        sampler = self.sampler
+        rows, n_h = sampler.take(fraction)
+        sample = pd.DataFrame({"h": sampler.codes[rows], "y": self.df[column].to_numpy()[rows]})
+        strata = sample.groupby("h")["y"].agg(["mean", "var", "count"])
+        N = sampler.sizes[strata.index]
+        n = strata["count"].to_numpy()
+        totals = N * strata["mean"].to_numpy()
+        variances = N ** 2 * (1 - n / N) * strata["var"].fillna(0).to_numpy() / n
+
+        stratum_group = sampler.stratum_values(0)
+        groups = stratum_group[strata.index]
+        total = pd.Series(totals).groupby(groups, observed=True).sum()
+        error = Z_95 * np.sqrt(pd.Series(variances).groupby(groups, observed=True).sum())
+        if stat == "mean":
+            sizes = pd.Series(sampler.sizes).groupby(stratum_group, observed=True).sum().reindex(total.index)
+            total, error = total / sizes, error / sizes
+        return Estimate(total, error, len(rows) / len(self.df))
+
+    def quantile_sketch(self, column):
+        with self.lock:
+            if column not in self.sketches:
+                self.sketches[column] = QuantileSketch().update(self.df[column].to_numpy())
+            return self.sketches[column]
+
+    # Values at evenly spaced ranks (an approximate sorted column) from the sketch
+    def sorted_curve(self, column, points=512):
+        sketch = self.quantile_sketch(column)
+        curve = sketch.quantiles(np.linspace(0, 1, points))
+        return Estimate(curve, sketch.rank_error(), 0.0, note=f"quantile sketch, k={sketch.k}")
+
+    def top_k_lists(self, column, tiebreak=None):
+        with self.lock:
+            key = (column, tiebreak)
+            if key not in self.top_lists:
+                ties = self.df[tiebreak].to_numpy() if tiebreak else None
+                self.top_lists[key] = TopKLists().update(self.df[column].to_numpy(), ties)
+            return self.top_lists[key]
+
+    # Top-n rows by `column` (ties broken by `tiebreak` ascending, then row order); exact for n <= TOP_K_LIST
+    def top_n(self, column, n, tiebreak=None):
+        lists = self.top_k_lists(column, tiebreak)
+        if n > lists.k:
+            raise ValueError(f"top_n supports n <= {lists.k}")
+        return Estimate(self.df.iloc[lists.rows[:n]])
+
+    # Exact answer computed once in the background. A future that failed is not
+    # kept: the caller that gets it sees the error, and the next request retries.
+    def exact(self, key, fn):
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None or (future.done() and (future.cancelled() or future.exception() is not None)):
+                future = self.futures[key] = self.executor.submit(fn)
+            return future
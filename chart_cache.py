@@ -0,0 +1,104 @@
+import streamlit as st
+
+# Per-session figure cache for the themed charts. Each chart keeps the figure
+# from its last render; when only the global theme changes, the artists that
+# carry the theme colour are recoloured in place and the figure is re-rastered,
+# skipping data preparation and layout entirely.
+CACHE_KEY = "_chart_cache"
+# Figures kept per session, least recently shown evicted first. There is one
+# entry per chart, and a run shows every chart in page order, so this must stay
+# above the number of cached charts on the page (23) or each run evicts its own
+# early figures before the next rerun can reuse them.
+MAX_CACHED_CHARTS = 40
+
+
+class CachedChart:
+    def __init__(self, params, color, fig, insight, artists):
+        self.params = params
+        self.color = color
+        self.fig = fig
+        self.insight = insight
+        self.artists = artists
+
+
+def _same_color(a, b):
+    from matplotlib.colors import to_rgba
+    try:
+        return to_rgba(a)[:3] == to_rgba(b)[:3]
+    except (TypeError, ValueError):
+        return False
+
+
+# (artist, setter) pairs for everything drawn in the theme colour
+def themed_artists(fig, color):
+    found = []
+    for ax in fig.axes:
+        # Bars, histogram bins and pie wedges
+        for patch in ax.patches:
+            if _same_color(patch.get_facecolor(), color):
+                found.append((patch, "set_facecolor"))
+        for line in ax.lines:
+            if _same_color(line.get_color(), color):
+                found.append((line, "set_color"))
+            if _same_color(line.get_markerfacecolor(), color):
+                found.append((line, "set_markerfacecolor"))
+            if _same_color(line.get_markeredgecolor(), color):
+                found.append((line, "set_markeredgecolor"))
+        for collection in ax.collections:
+            facecolors = collection.get_facecolors()
+            if len(facecolors) and all(_same_color(fc, color) for fc in facecolors):
+                found.append((collection, "set_facecolor"))
+            # Error bars are LineCollections: no face, the colour is on the edges
+            edgecolors = collection.get_edgecolors()
+            if len(edgecolors) and all(_same_color(ec, color) for ec in edgecolors):
+                found.append((collection, "set_edgecolor"))
+    return found
+
+
+# Drop this session's figures when the underlying data has changed
+def sync_chart_cache(data_version):
+    if st.session_state.get(CACHE_KEY + "_version") != data_version:
+        st.session_state[CACHE_KEY] = {}
+        st.session_state[CACHE_KEY + "_version"] = data_version
+
+
+# Re-render the cached figure for `name` if it was built with the same params; returns False on a miss
+def render_cached(name, params, color):
+    cached = st.session_state.get(CACHE_KEY, {}).get(name)
+    if cached is None or cached.params != params:
+        return False
+    if cached.color != color:
+        for artist, setter in cached.artists:
+            getattr(artist, setter)(color)
+        cached.color = color
+    st.pyplot(cached.fig)
+    st.markdown(cached.insight)
+    # Most recently shown last, so eviction drops the stalest figure
+    cache = st.session_state[CACHE_KEY]
+    cache[name] = cache.pop(name)
+    return True
+
+
+# Swap the figure onto a bare canvas: the Agg canvas it was drawn on keeps its
+# renderer (the full-resolution pixel buffer) alive for as long as the figure.
+# savefig still works: it renders through a temporary Agg canvas each time.
+def _release_renderer(fig):
+    from matplotlib.backend_bases import FigureCanvasBase
+
+    FigureCanvasBase(fig)
+
+
+# Render a freshly built figure and keep it (one per chart) for later restyles
+def render_and_cache(name, params, color, fig, insight):
+    import matplotlib.pyplot as plt
+
+    st.pyplot(fig)
+    # Detach from pyplot so kept figures don't pile up in its global registry
+    plt.close(fig)
+    _release_renderer(fig)
+    st.markdown(insight)
+    cache = st.session_state.setdefault(CACHE_KEY, {})
+    cache.pop(name, None)
+    cache[name] = CachedChart(params, color, fig, insight, themed_artists(fig, color))
+    while len(cache) > MAX_CACHED_CHARTS:
+        del cache[next(iter(cache))]
@@ -0,0 +1,190 @@
+import heapq
+import threading
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# Largest K kept per group (the UI can ask for any K up to this)
+MAX_K = 10
+# Past this fraction of changed rows a full rebuild is cheaper than merging
+REBUILD_FRACTION = 0.05
+METRICS = {
+    "units": "Units Sold (12m)",
+    "revenue": "Revenue (£)",
+    "discount": "Discount %",
+    "sentiment": "Avg Sentiment",
+}
+
+
+def metric_values(df, metric):
+    if metric == "units":
+        values = df["units_sold_12m"]
+    elif metric == "revenue":
+        values = df["price"] * df["units_sold_12m"]
+    elif metric == "discount":
+        values = (df["price"] - df["discount_price"]) / df["price"] * 100
+    elif metric == "sentiment":
+        values = df["avg_sentiment"]
+    else:
+        raise ValueError(f"Unknown metric {metric!r}")
+    return values.to_numpy(dtype=float)
+
+
+# The K largest values of one metric for every (manufacturer, size) group, as two
+# dense (groups x K) arrays of row positions and values, best first and padded
+# with -1 / -inf. Built in one vectorised pass: rows are lexsorted by group, then
+# value descending, then row position (ties go to the earlier row, as in
+# nlargest), and each row's rank within its group keeps those with rank < K.
+#
+# Per-manufacturer lists are heap-merges of that manufacturer's size groups, and
+# changed rows are merged into their group's list without touching other groups.
+class GroupTopK:
+    def __init__(self, values, makers, sizes, k=MAX_K):
+        self.k = k
+        # Own copy: updates write into it (the table itself may be read-only)
+        self.values = np.array(values, dtype=float)
+        maker_codes, self.makers = pd.factorize(pd.Series(makers).astype(str), sort=True)
+        size_codes, self.sizes = pd.factorize(pd.Series(sizes).astype(str), sort=True)
+        self.n_sizes = max(len(self.sizes), 1)
+        self.n_groups = len(self.makers) * self.n_sizes
+        self.group = maker_codes.astype(np.int64) * self.n_sizes + size_codes
+
+        # Rows of each group; membership is fixed, only values change
+        self.members = np.argsort(self.group, kind="stable")
+        self.member_starts = np.searchsorted(self.group[self.members], np.arange(self.n_groups + 1))
+        self.version = 0
+        self._build()
+
+    def _build(self):
+        self.top_rows = np.full((self.n_groups, self.k), -1, dtype=np.int64)
+        self.top_values = np.full((self.n_groups, self.k), -np.inf)
+        rows = np.flatnonzero(~np.isnan(self.values))
+        order = rows[np.lexsort((rows, -self.values[rows], self.group[rows]))]
+        groups = self.group[order]
+        rank = np.arange(len(order)) - np.searchsorted(groups, groups, side="left")
+        keep = rank < self.k
+        self.top_rows[groups[keep], rank[keep]] = order[keep]
+        self.top_values[groups[keep], rank[keep]] = self.values[order[keep]]
+
+    def _recompute_group(self, g):
+        rows = self.members[self.member_starts[g]:self.member_starts[g + 1]]
+        rows = rows[~np.isnan(self.values[rows])]
+        best = rows[np.lexsort((rows, -self.values[rows]))][:self.k]
+        self._store(g, best)
+
+    def _store(self, g, rows):
+        self.top_rows[g] = -1
+        self.top_values[g] = -np.inf
+        self.top_rows[g, :len(rows)] = rows
+        self.top_values[g, :len(rows)] = self.values[rows]
+
+    # Set new values for some rows and repair only the groups they belong to
+    def update(self, rows, new_values):
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        self.values[rows] = new_values
+        self.version += 1
+        if len(rows) > REBUILD_FRACTION * len(self.values):
+            self._build()
+            return
+
+        by_group = np.argsort(self.group[rows], kind="stable")
+        rows = rows[by_group]
+        groups = self.group[rows]
+        bounds = np.flatnonzero(np.diff(groups)) + 1
+        for changed in np.split(rows, bounds):
+            g = self.group[changed[0]]
+            filled = self.top_rows[g] >= 0
+            current, current_values = self.top_rows[g][filled], self.top_values[g][filled]
+            touched = np.isin(current, changed)
+            # A member that fell (or lost its value) may be overtaken by a row outside
+            # the list, which only a rescan of the group can find
+            if (~(self.values[current[touched]] >= current_values[touched])).any():
+                self._recompute_group(g)
+                continue
+            kept = zip(-current_values[~touched], current[~touched])
+            candidates = changed[~np.isnan(self.values[changed])]
+            candidates = sorted(zip(-self.values[candidates], candidates))
+            best = [row for _, row in islice(heapq.merge(kept, candidates), self.k)]
+            self._store(g, np.array(best, dtype=np.int64))
+
+    def _group_list(self, g, k):
+        rows = self.top_rows[g, :k]
+        filled = rows >= 0
+        return rows[filled], self.top_values[g, :k][filled]
+
+    # (row positions, values) of the best k rows of a manufacturer, optionally for one size
+    def group_top(self, maker, size=None, k=None):
+        k = k or self.k
+        m = self.makers.get_loc(str(maker))
+        if size is not None:
+            return self._group_list(m * self.n_sizes + self.sizes.get_loc(str(size)), k)
+        lists = []
+        for g in range(m * self.n_sizes, (m + 1) * self.n_sizes):
+            rows, values = self._group_list(g, k)
+            lists.append(zip(-values, rows))
+        best = list(islice(heapq.merge(*lists), k))
+        return (np.array([row for _, row in best], dtype=np.int64),
+                np.array([-value for value, _ in best], dtype=float))
+
+    # Top k per manufacturer for every manufacturer at once (long format)
+    def per_manufacturer(self, k=None):
+        k = k or self.k
+        rows = self.top_rows.reshape(len(self.makers), self.n_sizes * self.k)
+        values = self.top_values.reshape(len(self.makers), self.n_sizes * self.k)
+        order = np.lexsort((np.where(rows < 0, len(self.values), rows), -values), axis=-1)[:, :k]
+        rows = np.take_along_axis(rows, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        filled = rows >= 0
+        return pd.DataFrame({
+            "manufacturer": np.repeat(self.makers.to_numpy(), k).reshape(-1, k)[filled],
+            "rank": np.broadcast_to(np.arange(1, k + 1), rows.shape)[filled],
+            "row": rows[filled],
+            "value": values[filled],
+        })
+
+    # Overall top k (the global top k is always contained in the union of the group lists)
+    def overall(self, k=None):
+        k = k or self.k
+        rows, values = self.top_rows.ravel(), self.top_values.ravel()
+        filled = rows >= 0
+        rows, values = rows[filled], values[filled]
+        order = np.lexsort((rows, -values))[:k]
+        return rows[order], values[order]
+
+
+# Lazily built GroupTopK per metric over one products table (shared by all sessions).
+# sync() moves every built metric to a newer version of the table by merging only
+# the rows whose value changed, e.g. after new reviews shift avg_sentiment.
+class TopKIndex:
+    def __init__(self, df, k=MAX_K, group="manufacturer", subgroup="size"):
+        self.df = df
+        self.k = k
+        self.group = group
+        self.subgroup = subgroup
+        self.engines = {}
+        self.synced = None
+        self.lock = threading.Lock()
+
+    def metric(self, name):
+        with self.lock:
+            if name not in self.engines:
+                self.engines[name] = GroupTopK(metric_values(self.df, name), self.df[self.group].to_numpy(),
+                                               self.df[self.subgroup].to_numpy(), self.k)
+            return self.engines[name]
+
+    # Bring built metrics up to date with `df` (same rows, possibly changed values)
+    def sync(self, df, data_version):
+        with self.lock:
+            if data_version == self.synced:
+                return
+            for name, engine in self.engines.items():
+                values = metric_values(df, name)
+                same = (values == engine.values) | (np.isnan(values) & np.isnan(engine.values))
+                changed = np.flatnonzero(~same)
+                if len(changed):
+                    engine.update(changed, values[changed])
+            self.df = df
+            self.synced = data_version
@@ -0,0 +1,272 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Load-test harness: runs the real dashboard in-process (no browser, no server)
+# with N concurrent sessions clicking through it, and reports rerun latency,
+# throughput, CPU and peak RSS per session count.
+#
+#   python load_test.py --sessions 1,2,4,8,16 --rows 0,100000,1000000
+#
+# Each (rows, sessions) level runs in a fresh interpreter, so peak RSS and the
+# process-wide caches are per level, like a freshly started replica. Sessions
+# within a level share one process and its st.cache_* caches.
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "synthetic_analyis.py")
+SOURCE_CSV = "products.csv"
+CATALOG_DIR = ".loadtest"
+RUN_TIMEOUT = 300.0
+
+# Relative weights of the interactions a session performs. Expander bodies
+# always execute in Streamlit (expanding is client-side and sends no rerun),
+# so "opening a chart" is modelled by the widgets inside the expanders.
+ACTION_WEIGHTS = {
+    "chart_type": 0.45,
+    "sentiment_button": 0.2,
+    "theme": 0.15,
+    "slider": 0.15,
+    "approx_mode": 0.05,
+}
+
+
+# A catalog of `rows` products resampled from the source CSV (rows=0: the source itself).
+# Prices and volumes are jittered and derived columns recomputed; `manufacturer_copies`
+# splits every manufacturer into that many, for wide group-by workloads.
+def make_catalog(rows, manufacturer_copies=1, source=SOURCE_CSV, catalog_dir=CATALOG_DIR, seed=0):
+    if not rows and manufacturer_copies == 1:
+        return source
+    path = os.path.join(catalog_dir, f"catalog_{rows}_{manufacturer_copies}.csv")
+    if os.path.exists(path):
+        return path
+
+    base = pd.read_csv(source)
+    rows = rows or len(base)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(len(base), size=rows)].reset_index(drop=True)
+    df["product_id"] = df["product_id"] + "-" + pd.Series(np.arange(rows)).astype(str)
+    if manufacturer_copies > 1:
+        copy = pd.Series(rng.integers(manufacturer_copies, size=rows)).astype(str)
+        df["manufacturer"] = df["manufacturer"] + " " + copy
+
+    scale = rng.uniform(0.9, 1.1, size=rows)
+    for column in ["price", "discount_price", "bulk_price"]:
+        df[column] = (df[column] * scale).round(2)
+    df["bulk_price_per_unit"] = (df["bulk_price"] / 3).round(2)
+    for column in ["units_sold_12m", "stock_level"]:
+        df[column] = np.maximum((df[column] * rng.uniform(0.8, 1.2, size=rows)).round(), 0).astype(int)
+    df["revenue"] = df["price"] * df["units_sold_12m"]
+    df["stock_value"] = df["price"] * df["stock_level"]
+    df["discount_pct"] = (df["price"] - df["discount_price"]) / df["price"] * 100
+    df["discount_amount_pct"] = df["discount_pct"]
+
+    os.makedirs(catalog_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+# AppTest installs a mock Runtime for the duration of each run and clears it
+# afterwards, which would pull it out from under the other sessions' scripts.
+# Keep the last installed one visible while any session is still running.
+def share_test_runtime():
+    from streamlit.runtime import Runtime
+
+    installed = {}
+    instance, exists = Runtime.instance.__func__, Runtime.exists.__func__
+
+    def shared_instance(cls):
+        if cls._instance is not None:
+            installed["runtime"] = cls._instance
+            return instance(cls)
+        if "runtime" in installed:
+            return installed["runtime"]
+        return instance(cls)
+
+    def shared_exists(cls):
+        return exists(cls) or "runtime" in installed
+
+    Runtime.instance = classmethod(shared_instance)
+    Runtime.exists = classmethod(shared_exists)
+
+
+def _choose_option(element, rng):
+    options = [o for o in element.options if o != element.value] or list(element.options)
+    return options[rng.integers(len(options))]
+
+
+# One interaction on the current page; returns the action name, or None if nothing applies
+def interact(at, action, rng):
+    if action == "chart_type":
+        boxes = [b for b in at.selectbox if b.key and b.key.startswith("chart_type_")]
+        if not boxes:
+            return None
+        box = boxes[rng.integers(len(boxes))]
+        box.set_value(_choose_option(box, rng))
+    elif action == "theme":
+        box = next((b for b in at.selectbox if "theme" in b.label), None)
+        if box is None:
+            return None
+        box.set_value(_choose_option(box, rng))
+    elif action == "slider":
+        sliders = [(s, True) for s in at.select_slider if s.key] + [(s, False) for s in at.slider if s.key]
+        if not sliders:
+            return None
+        slider, has_options = sliders[rng.integers(len(sliders))]
+        if has_options:
+            slider.set_value(type(slider.value)(_choose_option(slider, rng)))
+        else:
+            values = np.arange(slider.min, slider.max + slider.step, slider.step)
+            slider.set_value(type(slider.value)(values[rng.integers(len(values))]))
+    elif action == "sentiment_button":
+        buttons = [b for b in at.button if b.label.startswith("Show")]
+        if not buttons:
+            return None
+        buttons[rng.integers(len(buttons))].click()
+    elif action == "approx_mode":
+        box = next((c for c in at.checkbox if c.key == "approx_mode"), None)
+        if box is None:
+            return None
+        box.set_value(not box.value)
+    return action
+
+
+# One simulated user: the initial page load, then `n_actions` interactions with optional think time
+def run_session(session, n_actions, think, seed, results, start_barrier):
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng([seed, session + 1])
+    names = list(ACTION_WEIGHTS)
+    weights = np.array(list(ACTION_WEIGHTS.values()))
+    weights = weights / weights.sum()
+    at = AppTest.from_file(APP, default_timeout=RUN_TIMEOUT)
+    start_barrier.wait()
+
+    for step in range(n_actions + 1):
+        action = "initial load"
+        if step:
+            action = None
+            while action is None:
+                action = interact(at, names[rng.choice(len(names), p=weights)], rng)
+        start = time.perf_counter()
+        error = None
+        try:
+            at.run()
+            if len(at.exception):
+                error = at.exception[0].message
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        results.append((session, action, time.perf_counter() - start, error))
+        if think and step < n_actions:
+            time.sleep(rng.uniform(0, think))
+
+
+def _peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+# One load level in this process: `sessions` concurrent users against the catalog at `csv_path`
+def run_level(csv_path, sessions, n_actions, think=0.0, seed=0, warmup=True):
+    os.environ["PRODUCTS_CSV"] = csv_path
+    share_test_runtime()
+    if warmup:
+        # A replica that is already serving: data loaded and caches built
+        run_session(-1, 0, 0.0, seed, [], threading.Barrier(1))
+
+    results = []
+    barrier = threading.Barrier(sessions + 1)
+    threads = [threading.Thread(target=run_session, args=(s, n_actions, think, seed, results, barrier))
+               for s in range(sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for thread in threads:
+        thread.join()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    reruns = pd.DataFrame(results, columns=["session", "action", "seconds", "error"])
+    interactions = reruns.loc[reruns["action"] != "initial load", "seconds"]
+    initial = reruns.loc[reruns["action"] == "initial load", "seconds"]
+    p50, p95, p99 = np.percentile(interactions, [50, 95, 99]) if len(interactions) else (np.nan,) * 3
+    return {
+        "rows": len(pd.read_csv(csv_path, usecols=["product_id"])),
+        "sessions": sessions,
+        "reruns": len(reruns),
+        "errors": int(reruns["error"].notna().sum()),
+        "first_error": reruns["error"].dropna().iloc[0] if reruns["error"].notna().any() else None,
+        "initial_p50_ms": float(np.median(initial) * 1000) if len(initial) else np.nan,
+        "p50_ms": float(p50 * 1000),
+        "p95_ms": float(p95 * 1000),
+        "p99_ms": float(p99 * 1000),
+        "max_ms": float(interactions.max() * 1000) if len(interactions) else np.nan,
+        "reruns_per_s": len(reruns) / wall,
+        "cpu_s": cpu,
+        "cores_used": cpu / wall,
+        "peak_rss_mb": _peak_rss_mb(),
+        "per_action_p95_ms": (reruns.groupby("action")["seconds"].quantile(0.95) * 1000).round(1).to_dict(),
+    }
+
+
+# Each level in a fresh interpreter so its peak RSS and caches are its own
+def sweep(rows_list, sessions_list, n_actions, think=0.0, seed=0, warmup=True, manufacturer_copies=1):
+    context = multiprocessing.get_context("spawn")
+    for rows in rows_list:
+        csv_path = make_catalog(rows, manufacturer_copies, seed=seed)
+        for sessions in sessions_list:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                yield pool.submit(run_level, csv_path, sessions, n_actions, think, seed, warmup).result()
+
+
+REPORT_COLUMNS = [
+    ("rows", "{:>10,}"), ("sessions", "{:>8}"), ("reruns", "{:>7}"), ("errors", "{:>6}"),
+    ("initial_p50_ms", "{:>11.0f}"), ("p50_ms", "{:>8.0f}"), ("p95_ms", "{:>8.0f}"), ("p99_ms", "{:>8.0f}"),
+    ("reruns_per_s", "{:>9.2f}"), ("cpu_s", "{:>8.1f}"), ("cores_used", "{:>6.2f}"), ("peak_rss_mb", "{:>8.0f}"),
+]
+REPORT_HEADERS = ["rows", "sessions", "reruns", "errors", "load p50 ms", "p50 ms", "p95 ms", "p99 ms",
+                  "reruns/s", "CPU s", "cores", "RSS MB"]
+
+
+def format_row(result):
+    return "  ".join(fmt.format(result[key]) for key, fmt in REPORT_COLUMNS)
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the dashboard.")
+    parser.add_argument("--sessions", type=_int_list, default=[1, 2, 4, 8], help="comma-separated session counts")
+    parser.add_argument("--rows", type=_int_list, default=[0], help="comma-separated catalog sizes (0 = products.csv)")
+    parser.add_argument("--manufacturer-copies", type=int, default=1, help="split each manufacturer into this many")
+    parser.add_argument("--actions", type=int, default=20, help="interactions per session after the initial load")
+    parser.add_argument("--think", type=float, default=0.0, help="max random pause between interactions (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cold", action="store_true", help="skip the warm-up run (measure a cold replica)")
+    parser.add_argument("--json", help="also write all results to this file")
+    args = parser.parse_args()
+
+    widths = [len(fmt.format(0)) for _, fmt in REPORT_COLUMNS]
+    print("  ".join(f"{h:>{w}}" for h, w in zip(REPORT_HEADERS, widths)))
+    results = []
+    for result in sweep(args.rows, args.sessions, args.actions, args.think, args.seed,
+                        not args.cold, args.manufacturer_copies):
+        results.append(result)
+        print(format_row(result), flush=True)
+        if result["first_error"]:
+            print(f"    first error: {result['first_error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# One CSV per month, e.g. sales_history/2024-07.csv with columns:
+#   product_id, units_sold[, revenue]
+# (revenue defaults to units_sold * the product's current price)
+HISTORY_DIR = "sales_history"
+CACHE_FILE = os.path.join(HISTORY_DIR, "_history_cache.npz")
+MONTH_FILE_RE = re.compile(r"^(\d{4}-\d{2})\.csv$")
+WINDOWS = (3, 6, 12)
+COLUMNS = ("units", "revenue")
+# Prefix sums kept per product: enough for the longest window
+KEPT_PREFIXES = max(WINDOWS) + 1
+# Bumped when the cached array layout changes (older caches are rebuilt from the CSVs)
+CACHE_LAYOUT = 3
+
+
+def next_month(month):
+    year, number = map(int, month.split("-"))
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+# Per-product monthly sales kept as prefix sums along the month axis, so the
+# total over any window is cum[end] - cum[end - w] — one subtraction per product
+# whatever the window. Only the last KEPT_PREFIXES prefix sums are needed for
+# WINDOWS, so they live in a ring of that many rows (months x products, one
+# contiguous row written per month): per-product memory is bounded however long
+# the history grows. The per-manufacturer monthly series (small) keeps the full
+# history, with its 3/6/12-month rolling totals alongside. Months must be
+# consecutive: windows are counted in rows, so a missing month would silently
+# widen them.
+class SalesHistory:
+    def __init__(self, products):
+        self.product_ids = pd.Index(products["product_id"].astype(str), name="product_id")
+        self.manufacturer_codes, self.manufacturers = pd.factorize(products["manufacturer"].astype(str), sort=True)
+        self.prices = products["price"].to_numpy(dtype=float)
+        self.months = []
+        self.version = 0
+        self.lock = threading.Lock()
+        # Month files that were not loaded, with the reason (shown by the dashboard)
+        self.skipped = {}
+        self._capacity = 0
+        n_makers = len(self.manufacturers)
+        # cum[c][m % KEPT_PREFIXES] = total of column c over months [0, m), for the
+        # latest KEPT_PREFIXES values of m. Nothing is allocated until the first month arrives.
+        self.cum = {c: None for c in COLUMNS}
+        self.maker_monthly = {c: np.zeros((0, n_makers)) for c in COLUMNS}
+        self.maker_cum = {c: np.zeros((0, n_makers)) for c in COLUMNS}
+        self.maker_rolling = {(c, w): np.zeros((0, n_makers)) for c in COLUMNS for w in WINDOWS}
+
+    # Grow the per-manufacturer month axis geometrically so appends are amortised O(manufacturers)
+    def _reserve(self, n_months):
+        if self.cum[COLUMNS[0]] is None:
+            self.cum = {c: np.zeros((KEPT_PREFIXES, len(self.product_ids))) for c in COLUMNS}
+        if n_months <= self._capacity:
+            return
+        capacity = max(n_months, 2 * self._capacity)
+        used = len(self.months)
+
+        def grow(array, extra_row):
+            grown = np.zeros((capacity + extra_row, array.shape[1]))
+            kept = min(used + extra_row, array.shape[0])
+            grown[:kept] = array[:kept]
+            return grown
+
+        self.maker_cum = {c: grow(a, 1) for c, a in self.maker_cum.items()}
+        self.maker_monthly = {c: grow(a, 0) for c, a in self.maker_monthly.items()}
+        self.maker_rolling = {k: grow(a, 0) for k, a in self.maker_rolling.items()}
+        self._capacity = capacity
+
+    # Per-manufacturer totals of month m (and the rolling windows ending there)
+    def _append_makers(self, column, m, maker_values):
+        self.maker_monthly[column][m] = maker_values
+        self.maker_cum[column][m + 1] = self.maker_cum[column][m] + maker_values
+        for w in WINDOWS:
+            start = max(m + 1 - w, 0)
+            self.maker_rolling[(column, w)][m] = self.maker_cum[column][m + 1] - self.maker_cum[column][start]
+
+    # Add one month of sales (a DataFrame with product_id, units_sold[, revenue])
+    def append_month(self, month, sales):
+        if self.months and month != next_month(self.months[-1]):
+            raise ValueError(f"Month {month} does not follow the latest month {self.months[-1]}")
+        self._reserve(len(self.months) + 1)
+        m = len(self.months)
+
+        pos = self.product_ids.get_indexer(sales["product_id"].astype(str))
+        known = pos >= 0
+        units = np.zeros(len(self.product_ids))
+        np.add.at(units, pos[known], sales["units_sold"].to_numpy(dtype=float)[known])
+        if "revenue" in sales:
+            revenue = np.zeros(len(self.product_ids))
+            np.add.at(revenue, pos[known], sales["revenue"].to_numpy(dtype=float)[known])
+        else:
+            revenue = units * self.prices
+
+        n_makers = len(self.manufacturers)
+        for column, values in (("units", units), ("revenue", revenue)):
+            cum = self.cum[column]
+            np.add(cum[m % KEPT_PREFIXES], values, out=cum[(m + 1) % KEPT_PREFIXES])
+            self._append_makers(column, m, np.bincount(self.manufacturer_codes, weights=values, minlength=n_makers))
+
+        self.months.append(month)
+        self.version += 1
+        return int((~known).sum())
+
+    def __len__(self):
+        return len(self.months)
+
+    # Prefix sums m..n (n = months loaded) as rows, oldest first; m must still be in the ring
+    def _prefixes(self, column, first):
+        n = len(self.months)
+        if first < max(n - KEPT_PREFIXES + 1, 0):
+            raise ValueError(f"Only the latest {KEPT_PREFIXES - 1} months are kept per product")
+        return self.cum[column][np.arange(first, n + 1) % KEPT_PREFIXES]
+
+    # Per-product total of `column` over the `window` months ending at `end` (default: latest)
+    def window_totals(self, column, window, end=None):
+        if not self.months:
+            return pd.Series(0.0, index=self.product_ids)
+        end = len(self.months) if end is None else end
+        start = max(end - window, 0)
+        prefixes = self._prefixes(column, start)
+        return pd.Series(prefixes[end - start] - prefixes[0], index=self.product_ids)
+
+    # Per-product monthly values over the latest `months` months for a subset of product positions
+    # (months x products); at most max(WINDOWS) months are kept
+    def product_series(self, column, positions, months=max(WINDOWS)):
+        n = len(self.months)
+        first = max(n - months, 0)
+        if not n:
+            return pd.DataFrame(np.zeros((0, len(positions))))
+        cum = self._prefixes(column, first)[:, positions]
+        return pd.DataFrame(np.diff(cum, axis=0), index=self.months[first:])
+
+    # Monthly per-manufacturer series (months x manufacturers), or its rolling window totals
+    def manufacturer_series(self, column, window=None):
+        if window is None:
+            values = self.maker_monthly[column][:len(self.months)]
+        else:
+            values = self.maker_rolling[(column, window)][:len(self.months)]
+        return pd.DataFrame(values, index=self.months, columns=self.manufacturers)
+
+    def save(self, path=CACHE_FILE):
+        n = len(self.months)
+        first = max(n - KEPT_PREFIXES + 1, 0)
+        arrays = {f"cum_{c}": self._prefixes(c, first) if n else np.zeros((1, len(self.product_ids)))
+                  for c in COLUMNS}
+        arrays.update({f"maker_{c}": self.maker_monthly[c][:n] for c in COLUMNS})
+        arrays["layout"] = np.array(CACHE_LAYOUT)
+        arrays["product_ids"] = self.product_ids.to_numpy(dtype=str)
+        arrays["months"] = np.array(self.months, dtype=str)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    # Rebuild from the cached prefix-sum ring and manufacturer series (no CSV re-read)
+    def _restore(self, path):
+        cached = np.load(path)
+        if "layout" not in cached or int(cached["layout"]) != CACHE_LAYOUT:
+            return False
+        if not np.array_equal(cached["product_ids"], self.product_ids.to_numpy(dtype=str)):
+            return False
+        months = [str(month) for month in cached["months"]]
+        if not months:
+            return True
+        self._reserve(len(months))
+        for column in COLUMNS:
+            prefixes = cached[f"cum_{column}"]
+            first = len(months) + 1 - len(prefixes)
+            self.cum[column][np.arange(first, len(months) + 1) % KEPT_PREFIXES] = prefixes
+            for m, maker_values in enumerate(cached[f"maker_{column}"]):
+                self._append_makers(column, m, maker_values)
+        self.months = months
+        self.version += 1
+        return True
+
+    # Append the month files that follow the latest loaded month; returns the months added.
+    # Appending stops at a missing month (later files wait until it arrives), and files
+    # older than the history are reported in `skipped` rather than silently ignored.
+    def refresh(self, history_dir=HISTORY_DIR):
+        if not os.path.isdir(history_dir):
+            return []
+        added = []
+        with self.lock:
+            months = sorted(m.group(1) for m in map(MONTH_FILE_RE.match, os.listdir(history_dir)) if m)
+            available = set(months)
+            skipped = {}
+            if self.months:
+                for month in months:
+                    if month < self.months[0]:
+                        skipped[month] = f"older than the first loaded month {self.months[0]}"
+                expected = next_month(self.months[-1])
+            else:
+                expected = months[0] if months else None
+            while expected in available:
+                sales = pd.read_csv(os.path.join(history_dir, f"{expected}.csv"), dtype={"product_id": str})
+                self.append_month(expected, sales)
+                added.append(expected)
+                expected = next_month(expected)
+            for month in months:
+                if self.months and month > self.months[-1]:
+                    skipped[month] = f"waiting for missing month {expected}"
+            if skipped != self.skipped:
+                for month, reason in skipped.items():
+                    if self.skipped.get(month) != reason:
+                        warnings.warn(f"Sales history: {month}.csv not loaded ({reason})")
+                self.skipped = skipped
+            if added:
+                self.save(os.path.join(history_dir, os.path.basename(CACHE_FILE)))
+        return added
+
+    @classmethod
+    def load(cls, products, history_dir=HISTORY_DIR):
+        history = cls(products)
+        cache = os.path.join(history_dir, os.path.basename(CACHE_FILE))
+        if os.path.exists(cache) and not history._restore(cache):
+            history = cls(products)
+        history.refresh(history_dir)
+        return history
+
@@ -0,0 +1,394 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from glob import glob
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# Where raw review streams live. Each *.jsonl file holds one review per line:
+#   {"product_id": "GAD001", "text": "Love it, works great"}
+# A last line without a trailing newline is treated as still being written; it
+# is ingested once the file is unchanged between two ingests. Lines that are not
+# valid JSON or lack either field are skipped (with a warning), and a file that
+# shrank below its offset (rotated or truncated) is read again from the start.
+#
+# Several replicas may share one reviews directory: ingests are serialised by a
+# lock file next to the state, each ingest starts from the latest saved state,
+# and every replica reloads that state when another one has saved a newer one.
+REVIEWS_DIR = "reviews"
+STATE_FILE = os.path.join(REVIEWS_DIR, "_sentiment_state.csv")
+OFFSETS_FILE = os.path.join(REVIEWS_DIR, "_offsets.json")
+
+# Reviews scored per vectorized batch (bounds memory while ingesting)
+BATCH_SIZE = 100_000
+REQUIRED_FIELDS = ["product_id", "text"]
+
+# Offline lexicon scorer: word -> valence on a -4..+4 scale (VADER style)
+LEXICON = {
+    "love": 3.2, "loved": 2.9, "loves": 2.7, "amazing": 2.8, "awesome": 3.1,
+    "excellent": 2.7, "fantastic": 2.6, "perfect": 2.7, "great": 3.1, "brilliant": 2.8,
+    "good": 1.9, "nice": 1.8, "happy": 2.7, "pleased": 1.9, "recommend": 1.5,
+    "recommended": 1.5, "works": 0.8, "worth": 0.9, "solid": 1.2, "reliable": 1.5,
+    "fun": 2.3, "cool": 1.3, "easy": 1.9, "fast": 0.8, "quiet": 0.9, "sturdy": 1.3,
+    "beautiful": 2.9, "best": 3.2, "better": 1.9, "impressive": 2.3, "useful": 1.9,
+    "bad": -2.5, "terrible": -3.1, "awful": -3.1, "horrible": -2.5, "worst": -3.1,
+    "poor": -2.1, "broken": -2.0, "broke": -1.8, "useless": -1.8, "disappointing": -2.2,
+    "disappointed": -1.9, "waste": -1.8, "cheap": -0.8, "flimsy": -1.6, "slow": -1.0,
+    "noisy": -1.1, "hate": -2.7, "hated": -3.2, "refund": -1.2, "return": -0.5,
+    "returned": -1.0, "faulty": -2.1, "defective": -2.2, "annoying": -1.7, "junk": -2.4,
+    "rubbish": -2.2, "problem": -1.7, "problems": -1.7, "fails": -1.9, "failed": -2.3,
+    "stopped": -0.8, "overpriced": -1.6, "meh": -0.6, "ok": 0.9, "okay": 0.9,
+}
+NEGATIONS = {"not", "no", "never", "isn't", "isnt", "don't", "dont", "doesn't", "doesnt",
+             "wasn't", "wasnt", "didn't", "didnt", "can't", "cant", "won't", "wont"}
+NEGATION_SCALAR = -0.74
+NORMALIZE_ALPHA = 15
+
+# Tokens are runs of [a-z'] after ASCII lower-casing, identified by a 64-bit
+# polynomial hash (arithmetic wraps mod 2**64; the base is odd, so invertible)
+HASH_BASE = 1_000_003
+HASH_BASE_INV = pow(HASH_BASE, -1, 2 ** 64)
+WORD_BYTES = np.zeros(256, dtype=bool)
+WORD_BYTES[np.frombuffer(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'", dtype=np.uint8)] = True
+LOWER_BYTES = np.arange(256, dtype=np.uint8)
+LOWER_BYTES[65:91] += 32
+
+
+# (hash of every token, review index of every token) for a list of strings, in
+# whole-buffer numpy passes: the texts are joined into one byte array, token
+# boundaries are where the word-byte mask flips, and each token's hash is a
+# difference of prefix sums of byte * base**position, shifted back to position 0
+def tokenize(texts):
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"\n".join(encoded), dtype=np.uint8)
+
+    edges = np.diff(WORD_BYTES[buf].astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    powers = np.cumprod(np.full(len(buf), HASH_BASE, dtype=np.uint64))
+    inverse_powers = np.cumprod(np.full(len(buf), HASH_BASE_INV, dtype=np.uint64))
+    prefix = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(LOWER_BYTES[buf].astype(np.uint64) * powers)])
+    hashes = (prefix[ends] - prefix[starts]) * inverse_powers[starts] if len(starts) else np.zeros(0, dtype=np.uint64)
+
+    # Each text is followed by one separator byte
+    text_starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+    review = np.searchsorted(text_starts, starts, side="right") - 1
+    return hashes, review
+
+
+def _lookup_table(words):
+    hashes, _ = tokenize(list(words))
+    order = np.argsort(hashes)
+    return hashes[order], order
+
+
+LEXICON_KEYS, _lexicon_order = _lookup_table(LEXICON)
+LEXICON_WEIGHTS = np.array(list(LEXICON.values()))[_lexicon_order]
+NEGATION_KEYS, _ = _lookup_table(NEGATIONS)
+
+
+# Score a batch of review texts in one vectorized pass, returning values in [-1, 1]
+def score_texts(texts):
+    texts = pd.Series(texts).fillna("").astype(str).tolist()
+    hashes, review = tokenize(texts)
+
+    pos = np.minimum(np.searchsorted(LEXICON_KEYS, hashes), len(LEXICON_KEYS) - 1)
+    weights = np.where(LEXICON_KEYS[pos] == hashes, LEXICON_WEIGHTS[pos], 0.0)
+
+    # A negation directly before a lexicon word in the same review flips it
+    negation = np.isin(hashes, NEGATION_KEYS)
+    negated = np.zeros(len(hashes), dtype=bool)
+    negated[1:] = negation[:-1] & (review[1:] == review[:-1])
+    weights = np.where(negated, weights * NEGATION_SCALAR, weights)
+
+    totals = np.bincount(review, weights=weights, minlength=len(texts))
+    return totals / np.sqrt(totals * totals + NORMALIZE_ALPHA)
+
+
+# (inode, mtime) of a state file, or None if it doesn't exist; os.replace gives every save a new inode
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+# Cross-process lock on the state next to `offsets_file`: exclusive to ingest,
+# shared to reload. Without fcntl (Windows) only one process may ingest.
+@contextmanager
+def _state_lock(offsets_file, exclusive):
+    directory = os.path.dirname(offsets_file) or "."
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    # No state directory yet: nothing to read and nothing to ingest
+    if fcntl is None or not os.path.isdir(directory):
+        yield
+        return
+    with open(os.path.join(directory, "_ingest.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Per-product running count, mean, min and max of review sentiment
+class SentimentStore:
+    def __init__(self):
+        self.ids = pd.Index([], dtype=object, name="product_id")
+        self.count = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self.offsets = {}
+        # file -> [size, mtime_ns] when its last line had no newline at the previous ingest
+        self.pending_tails = {}
+        self.version = 0
+        # Signature of the offsets file (saved last) this store was loaded from or saved to
+        self.state_signature = None
+        self.lock = threading.Lock()
+
+    # Fold one scored batch in, touching only the products it mentions
+    def update(self, product_ids, scores):
+        batch = pd.DataFrame({"product_id": product_ids, "score": scores})
+        agg = batch.groupby("product_id", sort=False)["score"].agg(["count", "sum", "min", "max"])
+
+        pos = self.ids.get_indexer(agg.index)
+        new = pos == -1
+        if new.any():
+            start = len(self.ids)
+            n_new = int(new.sum())
+            self.ids = self.ids.append(pd.Index(agg.index[new], name="product_id"))
+            self.count = np.concatenate([self.count, np.zeros(n_new, dtype=np.int64)])
+            self.total = np.concatenate([self.total, np.zeros(n_new)])
+            self.min = np.concatenate([self.min, np.full(n_new, np.inf)])
+            self.max = np.concatenate([self.max, np.full(n_new, -np.inf)])
+            pos[new] = np.arange(start, start + n_new)
+
+        self.count[pos] += agg["count"].to_numpy()
+        self.total[pos] += agg["sum"].to_numpy()
+        self.min[pos] = np.minimum(self.min[pos], agg["min"].to_numpy())
+        self.max[pos] = np.maximum(self.max[pos], agg["max"].to_numpy())
+        return agg.index
+
+    # Snapshot taken under the lock: ingest updates the arrays in place from other sessions' threads
+    def to_frame(self):
+        with self.lock:
+            return pd.DataFrame({
+                "review_count": self.count.copy(),
+                "avg_sentiment": self.total / np.maximum(self.count, 1),
+                "min_sentiment": self.min.copy(),
+                "max_sentiment": self.max.copy(),
+            }, index=self.ids)
+
+    def save(self, state_file=STATE_FILE, offsets_file=OFFSETS_FILE):
+        os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+        frame = pd.DataFrame({"review_count": self.count, "total": self.total,
+                              "min_sentiment": self.min, "max_sentiment": self.max}, index=self.ids)
+        frame.to_csv(state_file + ".tmp")
+        os.replace(state_file + ".tmp", state_file)
+        with open(offsets_file + ".tmp", "w") as f:
+            json.dump({"offsets": self.offsets, "pending_tails": self.pending_tails}, f)
+        os.replace(offsets_file + ".tmp", offsets_file)
+        self.state_signature = _signature(offsets_file)
+
+    def _read(self, state_file, offsets_file):
+        fresh = SentimentStore()
+        if os.path.exists(state_file):
+            frame = pd.read_csv(state_file, index_col="product_id")
+            fresh.ids = frame.index.astype(object)
+            fresh.count = frame["review_count"].to_numpy(dtype=np.int64)
+            fresh.total = frame["total"].to_numpy(dtype=float)
+            fresh.min = frame["min_sentiment"].to_numpy(dtype=float)
+            fresh.max = frame["max_sentiment"].to_numpy(dtype=float)
+        if os.path.exists(offsets_file):
+            with open(offsets_file) as f:
+                state = json.load(f)
+            # Older state files hold just the offsets
+            fresh.offsets = state["offsets"] if "offsets" in state else state
+            fresh.pending_tails = state.get("pending_tails", {})
+        self.ids, self.count, self.total, self.min, self.max = fresh.ids, fresh.count, fresh.total, fresh.min, fresh.max
+        self.offsets, self.pending_tails = fresh.offsets, fresh.pending_tails
+        self.state_signature = _signature(offsets_file)
+
+    # Reload if another process saved newer state (caller holds the state lock and self.lock)
+    def _reload(self, state_file, offsets_file):
+        if _signature(offsets_file) == self.state_signature:
+            return False
+        self._read(state_file, offsets_file)
+        self.version += 1
+        return True
+
+    # Pick up state saved by another replica; cheap (one stat) when nothing changed
+    def refresh(self, state_file=STATE_FILE, offsets_file=OFFSETS_FILE):
+        if _signature(offsets_file) == self.state_signature:
+            return False
+        with _state_lock(offsets_file, exclusive=False), self.lock:
+            return self._reload(state_file, offsets_file)
+
+    @classmethod
+    def load(cls, state_file=STATE_FILE, offsets_file=OFFSETS_FILE):
+        store = cls()
+        with _state_lock(offsets_file, exclusive=False):
+            store._read(state_file, offsets_file)
+        return store
+
+
+# State and offsets files kept alongside a reviews directory
+def state_paths(reviews_dir=REVIEWS_DIR):
+    return (os.path.join(reviews_dir, os.path.basename(STATE_FILE)),
+            os.path.join(reviews_dir, os.path.basename(OFFSETS_FILE)))
+
+
+# Reviews in a block of JSON lines and the number of lines rejected. The whole
+# block is parsed in one call; only if that fails is it parsed line by line.
+def parse_lines(lines):
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return pd.DataFrame(columns=REQUIRED_FIELDS), 0
+    try:
+        batch = pd.read_json(io.BytesIO(b"".join(lines)), lines=True, dtype=False)
+    except ValueError:
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+        batch = pd.DataFrame.from_records(records)
+    for field in REQUIRED_FIELDS:
+        if field not in batch:
+            batch[field] = None
+    batch = batch[batch["product_id"].notna() & batch["text"].notna()]
+    return batch, len(lines) - len(batch)
+
+
+# Yield (batch DataFrame, byte offset after the batch, lines rejected) for complete lines
+# past `offset`. A last line without a newline is only read when `final_tail` says it is complete.
+def read_batches(path, offset=0, batch_size=BATCH_SIZE, final_tail=False):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            lines = list(islice(f, batch_size))
+            if not lines:
+                return
+            # A half-written last line is left for the next ingest
+            partial = not lines[-1].endswith(b"\n") and not final_tail
+            if partial:
+                lines.pop()
+            if lines:
+                offset += sum(len(line) for line in lines)
+                batch, rejected = parse_lines(lines)
+                yield batch, offset, rejected
+            if partial or len(lines) < batch_size:
+                return
+
+
+# Consume every review not yet seen under `reviews_dir`; returns (reviews scored, affected product ids).
+# Each batch is folded in together with its offset, and whatever was applied is saved even if
+# a later file fails, so the saved state never lags the store and nothing is counted twice.
+def ingest(store, reviews_dir=REVIEWS_DIR, batch_size=BATCH_SIZE):
+    n_reviews = 0
+    affected = set()
+    state_changed = False
+    state_file, offsets_file = state_paths(reviews_dir)
+    with _state_lock(offsets_file, exclusive=True), store.lock:
+        # Continue from what other replicas have already ingested
+        store._reload(state_file, offsets_file)
+        try:
+            for path in sorted(glob(os.path.join(reviews_dir, "*.jsonl"))):
+                key = os.path.basename(path)
+                stat = os.stat(path)
+                signature = [stat.st_size, stat.st_mtime_ns]
+                if store.offsets.get(key, 0) > stat.st_size:
+                    warnings.warn(f"{key} shrank below its ingested offset; reading it again from the start")
+                    store.offsets[key] = 0
+                    store.pending_tails.pop(key, None)
+                    state_changed = True
+                # An unterminated last line is taken as complete once the file has stopped changing
+                final_tail = store.pending_tails.get(key) == signature
+                rejected = 0
+                for batch, offset, batch_rejected in read_batches(path, store.offsets.get(key, 0), batch_size, final_tail):
+                    if len(batch):
+                        scores = score_texts(batch["text"])
+                        affected.update(store.update(batch["product_id"].astype(str).to_numpy(), scores))
+                        n_reviews += len(batch)
+                    store.offsets[key] = offset
+                    rejected += batch_rejected
+                    state_changed = True
+                if rejected:
+                    warnings.warn(f"{key}: skipped {rejected:,} malformed review lines")
+                before = store.pending_tails.get(key)
+                if store.offsets.get(key, 0) < stat.st_size:
+                    store.pending_tails[key] = signature
+                else:
+                    store.pending_tails.pop(key, None)
+                state_changed = state_changed or store.pending_tails.get(key) != before
+        finally:
+            if n_reviews:
+                store.version += 1
+            if state_changed:
+                store.save(state_file, offsets_file)
+    return n_reviews, affected
+
+
+# Overwrite avg_sentiment for every product that has ingested reviews
+def apply_to(df, store):
+    # to_frame() snapshots the store under its lock
+    live = store.to_frame()
+    if live.empty:
+        return df
+    # Only the avg_sentiment column is copied; every other column is shared with `df`
+    df = df.copy(deep=False)
+    pos = live.index.get_indexer(df["product_id"])
+    hit = pos >= 0
+    sentiment = df["avg_sentiment"].to_numpy(dtype=float, copy=True)
+    sentiment[hit] = live["avg_sentiment"].to_numpy()[pos[hit]]
+    df["avg_sentiment"] = sentiment
+    return df
+
+
+# Synthetic reviews built from the lexicon, negations and filler words
+def synthetic_reviews(n, product_ids, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(list(LEXICON) + sorted(NEGATIONS) + ["the", "it", "this", "and", "was", "very", "after", "week"])
+    words = vocabulary[rng.integers(len(vocabulary), size=(n, 8))]
+    texts = pd.Series([" ".join(row) for row in words]).str.capitalize()
+    return pd.DataFrame({"product_id": np.asarray(product_ids)[rng.integers(len(product_ids), size=n)], "text": texts})
+
+
+# Scoring and end-to-end ingest throughput: python sentiment_pipeline.py bench [n_reviews]
+def benchmark(n=500_000):
+    reviews = synthetic_reviews(n, [f"P{i:06d}" for i in range(10_000)])
+    start = time.perf_counter()
+    score_texts(reviews["text"])
+    scoring = time.perf_counter() - start
+    print(f"score_texts  {n:>10,} reviews  {scoring:6.2f} s  {n / scoring:>12,.0f} reviews/s")
+
+    with tempfile.TemporaryDirectory() as reviews_dir:
+        reviews.to_json(os.path.join(reviews_dir, "bench.jsonl"), orient="records", lines=True)
+        start = time.perf_counter()
+        n_reviews, _ = ingest(SentimentStore(), reviews_dir)
+        elapsed = time.perf_counter() - start
+    print(f"ingest       {n_reviews:>10,} reviews  {elapsed:6.2f} s  {n_reviews / elapsed:>12,.0f} reviews/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        sys.exit("usage: python sentiment_pipeline.py bench [n_reviews]")
+    benchmark(*map(int, sys.argv[2:3]))
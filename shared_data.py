@@ -0,0 +1,355 @@
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Local data service: one loader process publishes the products table into a
+# shared-memory segment, and every dashboard worker maps it read-only.
+#
+#   python shared_data.py serve products.csv      # loader (re-publishes when the CSV changes)
+#   PRODUCTS_SHM=.products_shm streamlit run synthetic_analyis.py
+#
+# Layout of SHM_DIR:
+#   manifest.json            current version (swapped atomically with os.replace)
+#   leases/<version>.<pid>   one per worker process attached to a version
+#
+# Column encodings (every buffer lives in the segment and is mapped, not copied):
+#   numeric    values (bools included, as numpy bools)
+#   category   codes (-1 = missing) + dictionary as int64 offsets and a UTF-8 buffer (Categorical)
+#   string     int64 offsets and a UTF-8 buffer, i.e. Arrow large_string layout, plus an
+#              Arrow validity bitmap if any value is missing; read through pyarrow
+#              (copied into Python strings without it)
+SHM_DIR = os.environ.get("PRODUCTS_SHM", "")
+ALIGN = 64
+POLL_SECONDS = 1.0
+# String columns with more distinct values than this fraction of rows are stored as strings, not codes
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _manifest_path(shm_dir):
+    return os.path.join(shm_dir, "manifest.json")
+
+
+def _lease_dir(shm_dir):
+    return os.path.join(shm_dir, "leases")
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+# The dtype pandas itself uses for Categorical codes, so they can be wrapped as they are
+def _codes_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+# (int64 offsets, UTF-8 bytes) for a list of strings
+def _utf8(values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _decode_utf8(offsets, data):
+    raw = bytes(data)
+    return [raw[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+# Column name -> (kind, {buffer name: numpy array}). Integers are downcast, repetitive
+# strings become dictionary codes and the rest keep one contiguous UTF-8 buffer.
+# Missing strings stay missing (code -1, or a cleared validity bit).
+def to_columns(df):
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_bool_dtype(series):
+            columns[name] = ("numeric", {"values": series.to_numpy(dtype=bool)})
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            if pd.api.types.is_integer_dtype(series):
+                series = pd.to_numeric(series, downcast="integer")
+            columns[name] = ("numeric", {"values": series.to_numpy()})
+            continue
+        missing = series.isna().to_numpy()
+        strings = series.astype(str).where(~missing)
+        codes, categories = pd.factorize(strings, sort=False)
+        if len(categories) <= MAX_CATEGORY_RATIO * len(series):
+            offsets, data = _utf8(list(categories))
+            columns[name] = ("category", {"codes": codes.astype(_codes_dtype(len(categories))),
+                                          "category_offsets": offsets, "category_data": data})
+        else:
+            offsets, data = _utf8(strings.fillna("").tolist())
+            buffers = {"offsets": offsets, "data": data}
+            if missing.any():
+                buffers["validity"] = np.packbits(~missing, bitorder="little")
+            columns[name] = ("string", buffers)
+    return columns
+
+
+# Categorical over the mapped codes. from_codes copies them on some pandas
+# versions, so the codes are wrapped directly where pandas allows it.
+def _categorical(codes, categories):
+    dtype = pd.CategoricalDtype(pd.Index(categories))
+    try:
+        categorical = pd.Categorical._simple_new(codes, dtype)
+        if np.shares_memory(categorical.codes, codes):
+            return categorical
+    except (AttributeError, TypeError):
+        pass
+    return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+# Arrow-backed strings over the mapped offsets, bytes and validity bitmap (no per-row Python objects)
+def _strings(offsets, data, validity=None):
+    n = len(offsets) - 1
+    try:
+        import pyarrow as pa
+    except ImportError:
+        strings = np.array(_decode_utf8(offsets, data), dtype=object)
+        if validity is not None:
+            strings[~np.unpackbits(validity, count=n, bitorder="little").astype(bool)] = np.nan
+        return strings
+    bitmap = None if validity is None else pa.py_buffer(validity)
+    array = pa.Array.from_buffers(pa.large_string(), n, [bitmap, pa.py_buffer(offsets), pa.py_buffer(data)])
+    return pd.arrays.ArrowStringArray(array)
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Readers must not let their resource tracker unlink the loader's segment on exit
+    # (Python < 3.13 registers every attachment; 3.13+ would take track=False instead)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Loader side: owns the segments, publishes versions and frees old ones once unreferenced
+class Publisher:
+    def __init__(self, shm_dir):
+        self.shm_dir = shm_dir
+        self.segments = {}  # version -> SharedMemory
+        self.version = 0
+        self.current = None
+        os.makedirs(_lease_dir(shm_dir), exist_ok=True)
+
+    def publish(self, df):
+        self.version += 1
+        version = f"{os.getpid()}-{self.version}"
+        columns = to_columns(df)
+
+        # Lay every buffer of every column out in one segment
+        layout, offset = [], 0
+        for name, (kind, buffers) in columns.items():
+            entry = {"name": name, "kind": kind, "buffers": {}}
+            for buffer_name, array in buffers.items():
+                offset = _aligned(offset)
+                entry["buffers"][buffer_name] = {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+                offset += array.nbytes
+            layout.append(entry)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for entry in layout:
+            _, buffers = columns[entry["name"]]
+            for buffer_name, spec in entry["buffers"].items():
+                array = buffers[buffer_name]
+                target = np.ndarray(len(array), dtype=array.dtype, buffer=shm.buf, offset=spec["offset"])
+                target[:] = array
+                del target
+        self.segments[version] = shm
+        self.current = version
+
+        manifest = {"version": version, "segment": shm.name, "rows": len(df), "columns": layout}
+        tmp = _manifest_path(self.shm_dir) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, _manifest_path(self.shm_dir))
+        return version
+
+    # Live leases per version (leases of dead worker processes are removed)
+    def leases(self):
+        counts = {}
+        for lease in os.listdir(_lease_dir(self.shm_dir)):
+            version, _, pid = lease.rpartition(".")
+            if pid.isdigit() and _pid_alive(int(pid)):
+                counts[version] = counts.get(version, 0) + 1
+            else:
+                os.remove(os.path.join(_lease_dir(self.shm_dir), lease))
+        return counts
+
+    # Unlink superseded versions nobody holds any more
+    def collect(self):
+        live = self.leases()
+        for version in list(self.segments):
+            if version != self.current and not live.get(version):
+                shm = self.segments.pop(version)
+                shm.close()
+                shm.unlink()
+
+    def close(self):
+        for shm in self.segments.values():
+            shm.close()
+            shm.unlink()
+        self.segments.clear()
+        if os.path.exists(_manifest_path(self.shm_dir)):
+            os.remove(_manifest_path(self.shm_dir))
+
+
+# A worker's read-only, zero-copy view of one published version.
+#
+# The mapping must outlive every array that points into it, including shallow
+# copies of the frame held by caches and background work. numpy views keep
+# their base array alive, so each base array created here carries a weakref
+# finalizer. After release(), the segment is unmapped and the lease removed only
+# once the last of those arrays has been collected.
+class Attachment:
+    def __init__(self, shm_dir, manifest):
+        self.shm_dir = shm_dir
+        self.version = manifest["version"]
+        self.lease = os.path.join(_lease_dir(shm_dir), f"{self.version}.{os.getpid()}")
+        self.lock = threading.RLock()
+        self.live_arrays = 0
+        self.retired = False
+        self.closed = False
+        # Lease first, so the loader can't free the segment between reading the manifest and attaching
+        open(self.lease, "w").close()
+        try:
+            self.shm = _attach(manifest["segment"])
+        except FileNotFoundError:
+            os.remove(self.lease)
+            raise
+
+        data = {}
+        for entry in manifest["columns"]:
+            buffers = {name: self._array(spec["dtype"], spec["length"], spec["offset"])
+                       for name, spec in entry["buffers"].items()}
+            if entry["kind"] == "category":
+                categories = _decode_utf8(buffers["category_offsets"], buffers["category_data"])
+                data[entry["name"]] = _categorical(buffers["codes"], categories)
+            elif entry["kind"] == "string":
+                data[entry["name"]] = _strings(buffers["offsets"], buffers["data"], buffers.get("validity"))
+            else:
+                data[entry["name"]] = buffers["values"]
+        # copy=False keeps one block per column, backed directly by the shared buffer
+        self.df = pd.DataFrame(data, copy=False)
+
+    # Read-only array over part of the segment, tracked until it is garbage collected
+    def _array(self, dtype, length, offset):
+        array = np.ndarray(length, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+        array.flags.writeable = False
+        with self.lock:
+            self.live_arrays += 1
+        weakref.finalize(array, self._array_collected)
+        return array
+
+    def _array_collected(self):
+        with self.lock:
+            self.live_arrays -= 1
+            if self.retired and not self.live_arrays:
+                self._close()
+
+    def _close(self):
+        if self.closed:
+            return
+        try:
+            self.shm.close()
+        except BufferError:
+            # Still exported (e.g. wrapped by another library); leave it mapped rather than crash
+            return
+        self.closed = True
+        if os.path.exists(self.lease):
+            os.remove(self.lease)
+
+    # Stop serving this version; it is unmapped once nothing references its arrays
+    def release(self):
+        self.df = None
+        with self.lock:
+            self.retired = True
+            if not self.live_arrays:
+                self._close()
+            return self.closed
+
+
+# Worker side: follows the manifest and swaps to new versions as they are published.
+# One Subscriber is shared by every session thread of the process, so the
+# check/attach/swap runs under a lock: two threads attaching the same version
+# would share one lease path and one of them would release the other's mapping.
+class Subscriber:
+    def __init__(self, shm_dir=SHM_DIR):
+        self.shm_dir = shm_dir
+        self.current = None
+        self.manifest_stat = None
+        self.lock = threading.Lock()
+
+    # (version, DataFrame) of the newest published table
+    def frame(self, retries=3):
+        with self.lock:
+            for attempt in range(retries + 1):
+                try:
+                    self._follow_manifest()
+                    break
+                except FileNotFoundError:
+                    # Superseded and freed while we were reading it; follow the newer manifest
+                    if attempt == retries:
+                        raise
+            return self.current.version, self.current.df
+
+    def _follow_manifest(self):
+        # os.replace gives every manifest a new inode, so this changes even within one mtime tick
+        stat = os.stat(_manifest_path(self.shm_dir))
+        manifest_stat = (stat.st_ino, stat.st_mtime_ns)
+        if self.current is not None and manifest_stat == self.manifest_stat:
+            return
+        with open(_manifest_path(self.shm_dir)) as f:
+            manifest = json.load(f)
+        if self.current is None or manifest["version"] != self.current.version:
+            attachment = Attachment(self.shm_dir, manifest)
+            if self.current is not None:
+                # Frames already handed out keep the old mapping alive until they are dropped
+                self.current.release()
+            self.current = attachment
+        self.manifest_stat = manifest_stat
+
+
+def serve(csv_path, shm_dir=".products_shm"):
+    publisher = Publisher(shm_dir)
+    mtime = os.stat(csv_path).st_mtime_ns
+    print(f"published {publisher.publish(pd.read_csv(csv_path))} from {csv_path} into {shm_dir}")
+    try:
+        while True:
+            time.sleep(POLL_SECONDS)
+            if os.stat(csv_path).st_mtime_ns != mtime:
+                mtime = os.stat(csv_path).st_mtime_ns
+                print(f"published {publisher.publish(pd.read_csv(csv_path))} from {csv_path}")
+            publisher.collect()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "serve":
+        sys.exit("usage: python shared_data.py serve products.csv [shm_dir]")
+    serve(*sys.argv[2:4])
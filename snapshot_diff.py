@@ -0,0 +1,92 @@
+import os
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+# Daily catalog snapshots to compare (products.csv is always offered as the latest)
+SNAPSHOT_DIR = "snapshots"
+KEY = "product_id"
+LABEL_COLUMNS = ["manufacturer", "product_name"]
+# Columns compared between snapshots
+DIFF_COLUMNS = ["price", "discount_pct", "stock_level", "avg_sentiment"]
+LOAD_DTYPES = {
+    "product_id": str, "manufacturer": "category", "product_name": str,
+    "price": float, "discount_price": float, "stock_level": float, "avg_sentiment": float,
+}
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR, latest="products.csv"):
+    paths = sorted(glob(os.path.join(snapshot_dir, "*.csv")))
+    if os.path.exists(latest):
+        paths.append(latest)
+    return paths
+
+
+# (path, size, mtime) identifies a snapshot's contents for caching
+def signature(path):
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+# Only the columns the diff needs, with fixed dtypes so large files parse quickly
+def load_snapshot(path):
+    df = pd.read_csv(path, usecols=list(LOAD_DTYPES), dtype=LOAD_DTYPES)
+    df["discount_pct"] = (df["price"] - df["discount_price"]) / df["price"] * 100
+    return df.drop(columns="discount_price")
+
+
+# Join two snapshots on product_id through a hash index and compute column deltas.
+# Returns a dict of DataFrames: changes (matched products), added, removed and a
+# per-manufacturer summary.
+def diff_snapshots(old, new):
+    old_index = pd.Index(old[KEY])
+    if not old_index.is_unique:
+        raise ValueError(f"Duplicate {KEY} values in the older snapshot")
+    pos = old_index.get_indexer(new[KEY])
+    matched = pos >= 0
+    old_pos = pos[matched]
+
+    changes = new.loc[matched, [KEY] + LABEL_COLUMNS].reset_index(drop=True)
+    for column in DIFF_COLUMNS:
+        before = old[column].to_numpy()[old_pos]
+        after = new[column].to_numpy()[matched]
+        changes[f"{column}_old"] = before
+        changes[f"{column}_new"] = after
+        changes[f"{column}_delta"] = after - before
+
+    in_new = np.zeros(len(old), dtype=bool)
+    in_new[old_pos] = True
+    added = new.loc[~matched].reset_index(drop=True)
+    removed = old.loc[~in_new].reset_index(drop=True)
+
+    # Per-manufacturer summary (outer join, so makers with only new/removed products appear too)
+    by = changes["manufacturer"]
+    parts = {
+        "price_cuts": (changes["price_delta"] < 0).groupby(by, observed=True).sum(),
+        "price_rises": (changes["price_delta"] > 0).groupby(by, observed=True).sum(),
+        "avg_price_change": changes["price_delta"].groupby(by, observed=True).mean(),
+        "avg_discount_change_pts": changes["discount_pct_delta"].groupby(by, observed=True).mean(),
+        "stock_change": changes["stock_level_delta"].groupby(by, observed=True).sum(),
+        "avg_sentiment_shift": changes["avg_sentiment_delta"].groupby(by, observed=True).mean(),
+        "new_products": added.groupby("manufacturer", observed=True).size(),
+        "removed_products": removed.groupby("manufacturer", observed=True).size(),
+    }
+    for part in parts.values():
+        part.index = part.index.astype(str)
+    summary = pd.concat(parts, axis=1).sort_index()
+    counts = ["price_cuts", "price_rises", "new_products", "removed_products"]
+    summary[counts] = summary[counts].fillna(0).astype(int)
+    summary.index.name = "manufacturer"
+
+    return {"changes": changes, "added": added, "removed": removed, "summary": summary}
+
+
+def diff_files(old_path, new_path):
+    return diff_snapshots(load_snapshot(old_path), load_snapshot(new_path))
+
+
+# The n most negative deltas of `column` (e.g. biggest price cuts, largest stock drops)
+def top_decreases(changes, column, n=10):
+    delta = changes[f"{column}_delta"]
+    return changes.loc[delta < 0].nsmallest(n, f"{column}_delta")
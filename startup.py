@@ -0,0 +1,127 @@
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Fast-start mode (on by default, FAST_START=0 restores eager imports):
+# matplotlib always uses the non-interactive Agg backend and a persistent font
+# cache next to the app (MPLCONFIGDIR), so a fresh process doesn't rebuild the
+# font list. That cache is where the start-up time is actually saved. pyplot is
+# also imported lazily, but the dashboard draws charts on every first page load
+# (expander bodies always run), so there the import is moved, not avoided.
+FAST_START = os.environ.get("FAST_START", "1") != "0"
+MPL_BACKEND = "Agg"
+MPL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mplcache")
+
+
+# Wall-clock time this process started and what that time refers to: psutil if
+# installed, else /proc on Linux, else (last resort) when this module was imported
+def process_start_time():
+    try:
+        import psutil
+        return psutil.Process().create_time(), "process start"
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the ")" closing the command name; starttime is field 22
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK")), "process start"
+    except (OSError, ValueError, IndexError):
+        return time.time(), "startup.py import"
+
+
+PROCESS_START, PROCESS_START_LABEL = process_start_time()
+
+# step -> seconds, first occurrence per process (reruns hit sys.modules and record nothing new)
+timings = {}
+
+
+@contextmanager
+def timed(step):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(step, time.perf_counter() - start)
+
+
+# Must run before matplotlib is first imported: pin the backend and reuse the
+# font list cache instead of rebuilding it in every fresh container/process
+def configure_matplotlib():
+    os.environ.setdefault("MPLBACKEND", MPL_BACKEND)
+    if "MPLCONFIGDIR" not in os.environ:
+        os.makedirs(MPL_CACHE_DIR, exist_ok=True)
+        os.environ["MPLCONFIGDIR"] = MPL_CACHE_DIR
+
+
+# Load the default font face and lay out some text once so the first real chart doesn't pay for it
+def warm_fonts():
+    from matplotlib import font_manager
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    font_manager.get_font(font_manager.findfont(font_manager.FontProperties()))
+    fig = Figure(figsize=(1, 1))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title("£0", fontweight="bold")
+    ax.set_xlabel("0%")
+    fig.canvas.draw()
+
+
+def import_module(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    if name.startswith("matplotlib"):
+        configure_matplotlib()
+    with timed(f"import {name}"):
+        module = importlib.import_module(name)
+    if name == "matplotlib.pyplot":
+        with timed("matplotlib font warm-up"):
+            warm_fonts()
+    return module
+
+
+# Stand-in for a module that is imported on first attribute access
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name):
+    if FAST_START and name not in sys.modules:
+        return LazyModule(name)
+    return import_module(name)
+
+
+# Seconds from PROCESS_START to now, recorded once per step
+def mark(step):
+    timings.setdefault(step, time.time() - PROCESS_START)
+
+
+# Rows of (step, seconds) in the order they first happened
+def startup_report():
+    return list(timings.items())
+
+
+if __name__ == "__main__":
+    # Cold-start breakdown for this interpreter: python startup.py
+    for name in ["streamlit", "pandas", "matplotlib.pyplot", "matplotlib.ticker"]:
+        import_module(name)
+    mark(f"total since {PROCESS_START_LABEL}")
+    for step, seconds in startup_report():
+        print(f"{step:<40} {seconds * 1000:8.1f} ms")
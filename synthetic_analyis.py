@@ -1,14 +1,145 @@
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+import os
+import time
+import warnings
+from startup import timed, lazy_module, mark, startup_report, FAST_START, PROCESS_START_LABEL
 
-# Load data
-@st.cache_data
-def load_data():
-    return pd.read_csv("products.csv")
+# Already imported by `streamlit run` before this script starts, so not timed
+import streamlit as st
+with timed("import pandas"):
+    import pandas as pd
+# Imported on first use; the first page load draws charts, so this moves the import rather than avoiding it
+plt = lazy_module("matplotlib.pyplot")
+ticker = lazy_module("matplotlib.ticker")
+with timed("import sentiment_pipeline"):
+    import sentiment_pipeline
+with timed("import chart_cache"):
+    from chart_cache import render_cached, render_and_cache, sync_chart_cache
+with timed("import threshold_index"):
+    from threshold_index import build_indexes, INDEXED_COLUMNS
+with timed("import approx"):
+    import approx
+with timed("import shared_data"):
+    import shared_data
+with timed("import snapshot_diff"):
+    import snapshot_diff
+with timed("import sales_history"):
+    import sales_history
+with timed("import group_topk"):
+    import group_topk
+
+# Catalog to load (PRODUCTS_CSV points the app at another file, e.g. a load-test catalog)
+PRODUCTS_CSV = os.environ.get("PRODUCTS_CSV", "products.csv")
+
+# Load data (one copy per process, never mutated: each run works on a shallow copy)
+@st.cache_resource
+def load_data(path=PRODUCTS_CSV):
+    with timed("load products.csv"):
+        return pd.read_csv(path)
+
+# Follows the shared-memory data service when PRODUCTS_SHM is set
+@st.cache_resource
+def get_shared_products():
+    return shared_data.Subscriber(shared_data.SHM_DIR)
+
+# (dataset version, products) from shared memory (zero-copy, read-only) or from the CSV
+def load_products():
+    if shared_data.SHM_DIR:
+        return get_shared_products().frame()
+    return PRODUCTS_CSV, load_data(PRODUCTS_CSV)
+
+# Live sentiment scores maintained by the review ingestion pipeline (shared by all sessions)
+@st.cache_resource
+def get_sentiment_store():
+    return sentiment_pipeline.SentimentStore.load(*sentiment_pipeline.state_paths())
+
+# Caches are keyed on dataset_version (the catalog) unless they read avg_sentiment, which
+# changes with every review ingest: those are keyed on data_version = (dataset version, sentiment version)
+
+# Products with avg_sentiment replaced by the running mean of ingested reviews. One entry:
+# a retired shared-memory version is unmapped only once no cached frame still holds it
+@st.cache_resource(max_entries=1)
+def load_live_data(data_version, _products):
+    return sentiment_pipeline.apply_to(_products, get_sentiment_store())
+
+# Sorted-value indexes for threshold/range counts (rebuilt only when the catalog changes)
+@st.cache_resource(max_entries=1)
+def get_threshold_indexes(dataset_version, _df):
+    return build_indexes(_df, [column for column in INDEXED_COLUMNS if column != "avg_sentiment"])
+
+# The sentiment index and sketch are the only ones that follow review ingests
+@st.cache_resource(max_entries=1)
+def get_sentiment_index(data_version, _df):
+    return build_indexes(_df, ["avg_sentiment"])["avg_sentiment"]
+
+@st.cache_resource(max_entries=1)
+def get_sentiment_sketch(data_version, _df):
+    return approx.QuantileSketch().update(_df["avg_sentiment"].to_numpy())
+
+# Top-K products per manufacturer and size for each metric (built on first use, then
+# kept current by merging changed rows, e.g. after a review ingest, instead of rebuilding)
+@st.cache_resource(max_entries=1)
+def get_topk_index(dataset_version, _df):
+    return group_topk.TopKIndex(_df)
+
+# Samples and sketches for approximate mode, built only once approximate mode is switched on
+# (charts 1-20 never read avg_sentiment, so review ingests don't rebuild it)
+@st.cache_resource(max_entries=1)
+def get_approx_engine(dataset_version, _df):
+    return approx.ApproxEngine(_df)
+
+def approx_engine():
+    return get_approx_engine(dataset_version, df_products)
+
+sentiment_store = get_sentiment_store()
+# Follow reviews ingested by other replicas
+sentiment_store.refresh(*sentiment_pipeline.state_paths())
+dataset_version, products = load_products()
+data_version = (dataset_version, sentiment_store.version)
+df_products = load_live_data(data_version, products).copy(deep=False)
+threshold_indexes = get_threshold_indexes(dataset_version, df_products)
+# Cheap until approximate mode is used; creating it every run lets the cache drop the old version's frame
+approx_engine()
+# Cached chart figures only depend on the catalog; sentiment views are not cached per figure
+sync_chart_cache(dataset_version)
+
+# Monthly sales history (optional): sales_history/YYYY-MM.csv, appended incrementally as new months arrive
+@st.cache_resource(max_entries=1)
+def get_sales_history(dataset_version, _products):
+    return sales_history.SalesHistory.load(_products)
+
+history = get_sales_history(dataset_version, products)
+history.refresh()
+if history.skipped:
+    st.warning("Sales history files not loaded: " + "; ".join(f"`{month}.csv` ({reason})" for month, reason in history.skipped.items()))
+# Charts 4, 5, 13 and 18 gain a "Trend" type once there is history to read from
+trend_types = ["Trend"] if len(history) else []
+
+# Rolling-window picker shown next to Trend charts
+def trend_window(key):
+    return st.select_slider("🗓️ Rolling window (months):", options=list(sales_history.WINDOWS), value=12, key=key)
+
+# Monthly units of the top products over the latest window (months x product names)
+def top_products_trend(window, n=10, tiebreak_by_price=False):
+    totals = history.window_totals("units", window)
+    if tiebreak_by_price:
+        candidates = pd.DataFrame({"units": totals.nlargest(n, keep="all")})
+        candidates["price"] = history.prices[history.product_ids.get_indexer(candidates.index)]
+        top = candidates.sort_values(["units", "price"], ascending=[False, True]).head(n).index
+    else:
+        top = totals.nlargest(n).index
+    positions = history.product_ids.get_indexer(top)
+    series = history.product_series("units", positions, window)
+    series.columns = df_products["product_name"].take(positions).to_numpy()
+    return series
 
-df_products = load_data()
+def plot_top_products_trend(series, window, title):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    series.plot(ax=ax, marker="o", colormap="viridis")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Units Sold")
+    ax.set_title(f"{title} (last {window} months)", fontsize=14, fontweight="bold")
+    ax.legend(title="Product", bbox_to_anchor=(1.05, 1), loc="upper left")
+    return fig
 
 # Color themes
 color_themes = {
@@ -32,19 +163,87 @@ st.session_state.global_theme = st.selectbox(
     index=0
 )
 
+# Approximate mode: sample/sketch answers first, refined to exact in the background
+approx_mode = st.checkbox(
+    "⚡ Approximate mode (answers within ~1% first, then refines to exact)",
+    key="approx_mode"
+)
+if approx_mode:
+    # Start building the sample in the background while the page renders
+    approx_engine().start_sampling()
+
 # Show data sample
 st.subheader("📄 Dataset Preview")
 st.dataframe(df_products.head())
 
+# Charts drawn from an estimate; refined once every other chart is on screen
+pending_refinements = []
+
+def show_figure(fig, insight):
+    st.pyplot(fig)
+    plt.close(fig)
+    st.markdown(insight)
+
+# Render a chart from exact() directly, or in approximate mode from approximate(stage) first.
+# exact() may run later on a background thread, so it must take the frame as a default
+# argument rather than read df_products, which the review ingest below rebinds.
+def render_estimate(name, chart_type, color, exact, approximate, plot, stages=approx.SAMPLE_STAGES):
+    if not approx_mode:
+        render_and_cache(name, chart_type, color, *plot(exact()))
+        return
+    exact_future = approx_engine().exact(name, exact)
+    if exact_future.done():
+        render_and_cache(name, chart_type, color, *plot(exact_future.result()))
+        return
+    first = approximate(stages[0])
+    if first.exact:
+        render_and_cache(name, chart_type, color, *plot(first))
+        return
+    slot = st.empty()
+    with slot.container():
+        show_figure(*plot(first))
+    pending_refinements.append((slot, name, chart_type, color, approximate, plot, stages[1:], exact_future))
+
+# Redraw pending charts from larger samples, then from the exact background result
+def refine_pending():
+    for stage in sorted({stage for entry in pending_refinements for stage in entry[6]}):
+        for slot, name, chart_type, color, approximate, plot, stages, exact_future in pending_refinements:
+            if stage in stages and not exact_future.done():
+                with slot.container():
+                    show_figure(*plot(approximate(stage)))
+    for slot, name, chart_type, color, approximate, plot, stages, exact_future in pending_refinements:
+        with slot.container():
+            render_and_cache(name, chart_type, color, *plot(exact_future.result()))
+    pending_refinements.clear()
+
+# Insight suffix describing where an approximate answer came from and how far off it can be
+def approx_note(estimate, bound):
+    if estimate.exact:
+        return ""
+    source = estimate.note or f"{estimate.fraction:.1%} stratified sample"
+    return f"  \n⚡ _Approximate ({source}): {bound}. Refining to the exact answer…_"
+
 # CHART 1: Average Price per Manufacturer
 def chart_1(chart_type):
     theme = st.session_state.global_theme
-    avg_price = df_products.groupby("manufacturer")["price"].mean().sort_values(ascending=False)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_1", chart_type, color):
+        return
+    render_estimate(
+        "chart_1", chart_type, color,
+        lambda df=df_products: approx.Estimate(df.groupby("manufacturer", observed=True)["price"].mean()),
+        lambda stage: approx_engine().group_stat("price", "mean", stage),
+        lambda estimate: plot_chart_1(chart_type, theme, estimate),
+    )
+
+def plot_chart_1(chart_type, theme, estimate):
+    avg_price = estimate.values.sort_values(ascending=False)
+    error = None if estimate.exact else estimate.error.reindex(avg_price.index).values
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type == "Bar":
-        ax.barh(avg_price.index, avg_price.values, color=color_themes[theme]["primary"])
+        ax.barh(avg_price.index, avg_price.values, color=color_themes[theme]["primary"], xerr=error)
     elif chart_type == "Line":
-        ax.plot(avg_price.values, avg_price.index, color=color_themes[theme]["primary"], marker="o")
+        ax.errorbar(avg_price.values, avg_price.index, xerr=error, color=color_themes[theme]["primary"], marker="o")
     elif chart_type == "Pie":
         ax.pie(avg_price.values, labels=avg_price.index, autopct="%1.1f%%", colors=[color_themes[theme]["primary"]]*len(avg_price))
         ax.set_aspect('equal')
@@ -55,8 +254,10 @@ def chart_1(chart_type):
         ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"£{x:.0f}"))
     else:
         ax.set_title("Average Price Distribution (Pie)", fontsize=14, fontweight="bold")
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {avg_price.idxmax()} has the highest average product price: £{avg_price.max():.2f}")
+    insight = f"**Insight:** {avg_price.idxmax()} has the highest average product price: £{avg_price.max():.2f}"
+    if not estimate.exact:
+        insight += approx_note(estimate, f"±£{error[0]:.2f} at 95% confidence")
+    return fig, insight
 
 # Chart 1 UI
 with st.expander("📌 Chart 1: Average Price per Manufacturer"):
@@ -66,7 +267,10 @@ with st.expander("📌 Chart 1: Average Price per Manufacturer"):
 # CHART 2: Most Expensive Product per Manufacturer
 def chart_2(chart_type):
     theme = st.session_state.global_theme
-    max_price = df_products.groupby("manufacturer")["price"].max().sort_values(ascending=False)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_2", chart_type, color):
+        return
+    max_price = df_products.groupby("manufacturer", observed=True)["price"].max().sort_values(ascending=False)
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type == "Bar":
         ax.barh(max_price.index, max_price.values, color=color_themes[theme]["primary"])
@@ -82,8 +286,7 @@ def chart_2(chart_type):
         ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"£{x:.0f}"))
     else:
         ax.set_title("Max Price Distribution (Pie)", fontsize=14, fontweight="bold")
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {max_price.idxmax()} has the single most expensive product: £{max_price.max():.2f}")
+    render_and_cache("chart_2", chart_type, color, fig, f"**Insight:** {max_price.idxmax()} has the single most expensive product: £{max_price.max():.2f}")
 
 # Chart 2 UI
 with st.expander("📌 Chart 2: Most Expensive Product per Manufacturer"):
@@ -93,7 +296,10 @@ with st.expander("📌 Chart 2: Most Expensive Product per Manufacturer"):
 # CHART 3: Cheapest Product per Manufacturer
 def chart_3(chart_type):
     theme = st.session_state.global_theme
-    min_price = df_products.groupby("manufacturer")["price"].min().sort_values()
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_3", chart_type, color):
+        return
+    min_price = df_products.groupby("manufacturer", observed=True)["price"].min().sort_values()
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type == "Bar":
         ax.barh(min_price.index, min_price.values, color=color_themes[theme]["primary"])
@@ -109,8 +315,7 @@ def chart_3(chart_type):
         ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"£{x:.0f}"))
     else:
         ax.set_title("Min Price Distribution (Pie)", fontsize=14, fontweight="bold")
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {min_price.idxmin()} offers the cheapest product at: £{min_price.min():.2f}")
+    render_and_cache("chart_3", chart_type, color, fig, f"**Insight:** {min_price.idxmin()} offers the cheapest product at: £{min_price.min():.2f}")
 
 # Chart 3 UI
 with st.expander("📌 Chart 3: Cheapest Product per Manufacturer"):
@@ -121,9 +326,30 @@ with st.expander("📌 Chart 3: Cheapest Product per Manufacturer"):
 
 
 # CHART 4: Top 10 Products by Units Sold
-def chart_4(chart_type):
+def chart_4(chart_type, window=12):
     theme = st.session_state.global_theme
-    top_units = df_products.sort_values("units_sold_12m", ascending=False).head(10)
+    color = color_themes[theme]["primary"]
+    if chart_type == "Trend":
+        params = (chart_type, window, history.version)
+        if render_cached("chart_4", params, color):
+            return
+        series = top_products_trend(window)
+        fig = plot_top_products_trend(series, window, "Top 10 Products by Units Sold")
+        render_and_cache("chart_4", params, color, fig,
+                         f"**Insight:** {series.sum().idxmax()} sold the most units over the last {window} months.")
+        return
+    if render_cached("chart_4", chart_type, color):
+        return
+    render_estimate(
+        "chart_4", chart_type, color,
+        lambda df=df_products: approx.Estimate(df.nlargest(10, "units_sold_12m")),
+        lambda stage: approx_engine().top_n("units_sold_12m", 10),
+        lambda estimate: plot_chart_4(chart_type, theme, estimate),
+        stages=approx.SKETCH_STAGES,
+    )
+
+def plot_chart_4(chart_type, theme, estimate):
+    top_units = estimate.values
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
         if chart_type == "Bar":
@@ -133,30 +359,59 @@ def chart_4(chart_type):
         ax.set_xlabel("Units Sold")
         ax.set_title("Top 10 Products by Units Sold")
     else:
-        ax.pie(top_units["units_sold_12m"], labels=top_units["product_name"], autopct="%1.1f%%", colors=[color_themes[theme]["primary"]]*10)
+        ax.pie(top_units["units_sold_12m"], labels=top_units["product_name"], autopct="%1.1f%%", colors=[color_themes[theme]["primary"]]*len(top_units))
         ax.set_title("Top 10 Products by Units Sold (Pie)")
         ax.set_aspect('equal')
-    st.pyplot(fig)
-    st.markdown("**Insight:** These 10 products had the highest customer demand over the past year.")
+    insight = "**Insight:** These 10 products had the highest customer demand over the past year."
+    return fig, insight
 
 # UI block for charts 4
 with st.expander("📌 Chart 4: Top 10 Products by Units Sold"):
-    chart_type_4 = st.selectbox("📊 Choose chart type (default is recommended):", ["Bar", "Line", "Pie"], index=0, key="chart_type_4")
-    chart_4(chart_type_4)
+    chart_type_4 = st.selectbox("📊 Choose chart type (default is recommended):", ["Bar", "Line", "Pie"] + trend_types, index=0, key="chart_type_4")
+    chart_4(chart_type_4, trend_window("window_4") if chart_type_4 == "Trend" else 12)
 
 
 # CHART 5: Total Revenue by Manufacturer
-def chart_5(chart_type):
+def chart_5(chart_type, window=12):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if chart_type == "Trend":
+        params = (chart_type, window, history.version)
+        if render_cached("chart_5", params, color):
+            return
+        # Rolling revenue per manufacturer, maintained as each month is appended
+        rolling = history.manufacturer_series("revenue", window)
+        fig, ax = plt.subplots(figsize=(10, 6))
+        rolling.plot(ax=ax, colormap="viridis")
+        ax.set_xlabel("Month")
+        ax.set_ylabel(f"Revenue, rolling {window} months (£)")
+        ax.set_title(f"Rolling {window}-Month Revenue by Manufacturer")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"£{x/1000:.0f}K"))
+        ax.legend(title="Manufacturer", bbox_to_anchor=(1.05, 1), loc="upper left")
+        latest = rolling.iloc[-1]
+        render_and_cache("chart_5", params, color, fig,
+                         f"**Insight:** {latest.idxmax()} leads on revenue over the last {window} months (£{latest.max()/1000:,.0f}K).")
+        return
+    if render_cached("chart_5", chart_type, color):
+        return
     df_products["revenue"] = df_products["price"] * df_products["units_sold_12m"]
-    revenue = df_products.groupby("manufacturer")["revenue"].sum().sort_values(ascending=False)
+    render_estimate(
+        "chart_5", chart_type, color,
+        lambda df=df_products: approx.Estimate(df.groupby("manufacturer", observed=True)["revenue"].sum()),
+        lambda stage: approx_engine().group_stat("revenue", "sum", stage),
+        lambda estimate: plot_chart_5(chart_type, theme, estimate),
+    )
+
+def plot_chart_5(chart_type, theme, estimate):
+    revenue = estimate.values.sort_values(ascending=False)
+    error = None if estimate.exact else estimate.error.reindex(revenue.index).values
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
         if chart_type == "Bar":
-            ax.barh(revenue.index, revenue.values, color=color_themes[theme]["primary"])
+            ax.barh(revenue.index, revenue.values, color=color_themes[theme]["primary"], xerr=error)
         else:
-            ax.plot(revenue.values, revenue.index, marker="o", color=color_themes[theme]["primary"])
+            ax.errorbar(revenue.values, revenue.index, xerr=error, marker="o", color=color_themes[theme]["primary"])
         ax.set_xlabel("Total Revenue (£)")
         ax.set_title("Total Revenue by Manufacturer")
         ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"£{x/1000:.0f}K"))
@@ -165,25 +420,30 @@ def chart_5(chart_type):
         ax.set_title("Revenue Share by Manufacturer")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {revenue.idxmax()} generated the most revenue overall.")
+    insight = f"**Insight:** {revenue.idxmax()} generated the most revenue overall."
+    if not estimate.exact:
+        insight += approx_note(estimate, f"±£{error[0] / 1000:,.0f}K on the leader's total at 95% confidence")
+    return fig, insight
 
 # CHART 5 UI BLOCK
 with st.expander("📌 Chart 5: Total Revenue by Manufacturer"):
     chart_type_5 = st.selectbox(
         "📊 Choose chart type (default is recommended):",
-        ["Bar", "Line", "Pie"],
+        ["Bar", "Line", "Pie"] + trend_types,
         index=0,
         key="chart_type_5"
     )
-    chart_5(chart_type_5)
+    chart_5(chart_type_5, trend_window("window_5") if chart_type_5 == "Trend" else 12)
 
 
 # CHART 6: Stock Value by Manufacturer
 def chart_6(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_6", chart_type, color):
+        return
     df_products["stock_value"] = df_products["price"] * df_products["stock_level"]
-    stock_value = df_products.groupby("manufacturer")["stock_value"].sum().sort_values(ascending=False)
+    stock_value = df_products.groupby("manufacturer", observed=True)["stock_value"].sum().sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -199,8 +459,7 @@ def chart_6(chart_type):
         ax.set_title("Stock Value Distribution")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {stock_value.idxmax()} is holding the most value in inventory.")
+    render_and_cache("chart_6", chart_type, color, fig, f"**Insight:** {stock_value.idxmax()} is holding the most value in inventory.")
 
 # CHART 6 UI
 with st.expander("📌 Chart 6: Stock Value by Manufacturer"):
@@ -218,8 +477,11 @@ with st.expander("📌 Chart 6: Stock Value by Manufacturer"):
 # CHART 7: Average Discount % per Manufacturer
 def chart_7(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_7", chart_type, color):
+        return
     df_products["discount_pct"] = ((df_products["price"] - df_products["discount_price"]) / df_products["price"]) * 100
-    avg_discount = df_products.groupby("manufacturer")["discount_pct"].mean().sort_values(ascending=False)
+    avg_discount = df_products.groupby("manufacturer", observed=True)["discount_pct"].mean().sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -236,8 +498,7 @@ def chart_7(chart_type):
         ax.set_title("Average Discount Share")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {avg_discount.idxmax()} gives the steepest average discounts.")
+    render_and_cache("chart_7", chart_type, color, fig, f"**Insight:** {avg_discount.idxmax()} gives the steepest average discounts.")
 
 # CHART 7 UI
 with st.expander("📌 Chart 7: Average Discount % per Manufacturer"):
@@ -250,45 +511,58 @@ with st.expander("📌 Chart 7: Average Discount % per Manufacturer"):
     chart_7(chart_type_7)
 
 
-# CHART 8: Products with Stock Level < 10
-def chart_8(chart_type):
+# CHART 8: Products with Stock Level Below a Threshold
+def chart_8(chart_type, threshold=10):
     theme = st.session_state.global_theme
-    low_stock = df_products[df_products["stock_level"] < 10]
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_8", (chart_type, threshold), color):
+        return
+    # Products per stock level under the threshold, from binary searches on the sorted index
+    stock_index = threshold_indexes["stock_level"]
+    stock_counts = stock_index.distinct_counts_below(threshold)
+    stock_counts.index = stock_counts.index.astype(int)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
-        stock_counts = low_stock["stock_level"].value_counts().sort_index()
         if chart_type == "Bar":
             ax.barh(stock_counts.index, stock_counts.values, color=color_themes[theme]["primary"])
         else:
             ax.plot(stock_counts.index, stock_counts.values, marker="o", color=color_themes[theme]["primary"])
         ax.set_xlabel("Stock Level")
         ax.set_ylabel("Number of Products")
-        ax.set_title("Products with Stock Level < 10")
+        ax.set_title(f"Products with Stock Level < {threshold}")
     else:
-        pie_data = low_stock["stock_level"].value_counts().sort_index()
-        ax.pie(pie_data.values, labels=pie_data.index, autopct="%1.1f%%",
-               colors=[color_themes[theme]["primary"]]*len(pie_data))
+        ax.pie(stock_counts.values, labels=stock_counts.index, autopct="%1.1f%%",
+               colors=[color_themes[theme]["primary"]]*len(stock_counts))
         ax.set_title("Distribution of Low Stock Levels")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {len(low_stock)} products are at risk of stock-out (stock < 10).")
+    render_and_cache("chart_8", (chart_type, threshold), color, fig, f"**Insight:** {stock_index.count_below(threshold)} products are at risk of stock-out (stock < {threshold}).")
 
 # CHART 8 UI
-with st.expander("📌 Chart 8: Products with Stock Level < 10"):
+with st.expander("📌 Chart 8: Products with Low Stock Levels"):
     chart_type_8 = st.selectbox(
         "📊 Choose chart type (default is recommended):",
         ["Bar", "Line", "Pie"],
         index=0,
         key="chart_type_8"
     )
-    chart_8(chart_type_8)
+    stock_threshold_8 = st.slider(
+        "📦 Low-stock threshold:",
+        1,
+        max(int(threshold_indexes["stock_level"].max()) + 1, 10),
+        10,
+        key="stock_threshold_8"
+    )
+    chart_8(chart_type_8, stock_threshold_8)
 
 
 # CHART 9: Best Bulk Deals (Per Unit Price)
 def chart_9(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_9", chart_type, color):
+        return
     best_bulk = df_products.sort_values("bulk_price_per_unit").head(10)
 
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -306,8 +580,7 @@ def chart_9(chart_type):
         ax.set_title("Bulk Deal Distribution")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown("**Insight:** These products offer the best value when bought in bulk.")
+    render_and_cache("chart_9", chart_type, color, fig, "**Insight:** These products offer the best value when bought in bulk.")
 
 # CHART 9 UI
 with st.expander("📌 Chart 9: Best Bulk Deals (Per Unit Price)"):
@@ -323,6 +596,9 @@ with st.expander("📌 Chart 9: Best Bulk Deals (Per Unit Price)"):
 # CHART 10: Overall Product Size Distribution
 def chart_10(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_10", chart_type, color):
+        return
     size_counts = df_products["size"].value_counts()
 
     fig, ax = plt.subplots(figsize=(8, 6))
@@ -340,8 +616,7 @@ def chart_10(chart_type):
         ax.set_title("Product Size Share")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** Most products are '{size_counts.idxmax()}' size.")
+    render_and_cache("chart_10", chart_type, color, fig, f"**Insight:** Most products are '{size_counts.idxmax()}' size.")
 
 # CHART 10 UI
 with st.expander("📌 Chart 10: Overall Product Size Distribution"):
@@ -357,7 +632,10 @@ with st.expander("📌 Chart 10: Overall Product Size Distribution"):
 # CHART 11: Average Product Weight by Manufacturer
 def chart_11(chart_type):
     theme = st.session_state.global_theme
-    avg_weight = df_products.groupby("manufacturer")["weight"].mean().sort_values(ascending=False)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_11", chart_type, color):
+        return
+    avg_weight = df_products.groupby("manufacturer", observed=True)["weight"].mean().sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -374,8 +652,7 @@ def chart_11(chart_type):
         ax.set_title("Average Weight Share")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {avg_weight.idxmax()} has the heaviest average products.")
+    render_and_cache("chart_11", chart_type, color, fig, f"**Insight:** {avg_weight.idxmax()} has the heaviest average products.")
 
 # CHART 11 UI
 with st.expander("📌 Chart 11: Average Product Weight by Manufacturer"):
@@ -389,21 +666,50 @@ with st.expander("📌 Chart 11: Average Product Weight by Manufacturer"):
 
 
 # CHART 12: Overall Product Price Distribution
-def chart_12(chart_type):
+def chart_12(chart_type, bucket_width=50):
     theme = st.session_state.global_theme
-    prices = df_products["price"]
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_12", (chart_type, bucket_width), color):
+        return
+    price_index = threshold_indexes["price"]
+    if chart_type == "Pie":
+        # Bucket counts are binary searches on the sorted price index, so no estimate is needed
+        render_and_cache("chart_12", (chart_type, bucket_width), color,
+                         *plot_chart_12(chart_type, theme, approx.Estimate(price_index.sorted), bucket_width))
+        return
+    render_estimate(
+        "chart_12", (chart_type, bucket_width), color,
+        lambda: approx.Estimate(price_index.sorted),
+        lambda stage: approx_engine().sorted_curve("price"),
+        lambda estimate: plot_chart_12(chart_type, theme, estimate, bucket_width),
+        stages=approx.SKETCH_STAGES,
+    )
+
+# `estimate.values` is the sorted price column, or evenly spaced quantiles of it when approximate
+def plot_chart_12(chart_type, theme, estimate, bucket_width):
+    prices = estimate.values
+    n_products = len(threshold_indexes["price"])
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type == "Bar":
-        ax.hist(prices, bins=30, color=color_themes[theme]["primary"], edgecolor="black")
+        weights = None if estimate.exact else [n_products / len(prices)] * len(prices)
+        ax.hist(prices, bins=30, weights=weights, color=color_themes[theme]["primary"], edgecolor="black")
         ax.set_title("Product Price Distribution (Histogram)")
     elif chart_type == "Line":
-        ax.plot(sorted(prices), color=color_themes[theme]["primary"])
+        if estimate.exact:
+            ax.plot(prices, color=color_themes[theme]["primary"])
+        else:
+            ranks = pd.Series(range(len(prices))) * (n_products - 1) / (len(prices) - 1)
+            rank_error = estimate.error * n_products
+            ax.plot(ranks, prices, color=color_themes[theme]["primary"])
+            ax.fill_betweenx(prices, ranks - rank_error, ranks + rank_error, color="grey", alpha=0.2)
         ax.set_title("Product Price Distribution (Line)")
     elif chart_type == "Pie":
-        price_ranges = pd.cut(prices, bins=[0, 50, 100, 150, 200, prices.max()], right=False)
-        price_counts = price_ranges.value_counts().sort_index()
-        ax.pie(price_counts.values, labels=[f"{i.left:.0f}–{i.right:.0f}" for i in price_counts.index],
+        edges = list(range(0, int(prices[-1]) + bucket_width + 1, bucket_width))
+        price_counts = pd.Series(threshold_indexes["price"].histogram(edges),
+                                 index=[f"{lo}–{hi}" for lo, hi in zip(edges[:-1], edges[1:])])
+        price_counts = price_counts[price_counts > 0]
+        ax.pie(price_counts.values, labels=price_counts.index,
                autopct="%1.1f%%", colors=[color_themes[theme]["primary"]]*len(price_counts))
         ax.set_title("Price Range Distribution (Pie)")
         ax.set_aspect("equal")
@@ -411,8 +717,11 @@ def chart_12(chart_type):
     if chart_type in ["Bar", "Line"]:
         ax.set_xlabel("Price (£)")
         ax.set_ylabel("Product Count")
-    st.pyplot(fig)
-    st.markdown("**Insight:** Most products are priced between £50–£150.")
+    insight = "**Insight:** Most products are priced between £50–£150."
+    if not estimate.exact:
+        median = prices[len(prices) // 2]
+        insight += approx_note(estimate, f"median ≈ £{median:.0f}, quantiles within ±{estimate.error:.0%} in rank")
+    return fig, insight
 
 # CHART 12 UI
 with st.expander("📌 Chart 12: Overall Product Price Distribution"):
@@ -422,48 +731,62 @@ with st.expander("📌 Chart 12: Overall Product Price Distribution"):
         index=0,
         key="chart_type_12"
     )
-    chart_12(chart_type_12)
+    if chart_type_12 == "Pie":
+        bucket_width_12 = st.slider("💷 Price bucket width (£):", 10, 200, 50, step=10, key="bucket_width_12")
+    else:
+        bucket_width_12 = 50
+    chart_12(chart_type_12, bucket_width_12)
 
 # CHART 13: Revenue Distribution (Pareto Principle)
-def chart_13(chart_type):
+def chart_13(chart_type, window=12):
     theme = st.session_state.global_theme
-    df_products["revenue"] = df_products["price"] * df_products["units_sold_12m"]
-    product_revenue = df_products[["product_name", "revenue"]].sort_values("revenue", ascending=False).reset_index(drop=True)
+    color = color_themes[theme]["primary"]
+    params = (chart_type, window, history.version) if chart_type == "Trend" else chart_type
+    if render_cached("chart_13", params, color):
+        return
+    if chart_type == "Trend":
+        # Revenue per product over the latest window, straight from the prefix sums
+        product_revenue = history.window_totals("revenue", window).sort_values(ascending=False).reset_index(drop=True).to_frame("revenue")
+    else:
+        df_products["revenue"] = df_products["price"] * df_products["units_sold_12m"]
+        product_revenue = df_products[["product_name", "revenue"]].sort_values("revenue", ascending=False).reset_index(drop=True)
     product_revenue["cum_pct"] = product_revenue["revenue"].cumsum() / product_revenue["revenue"].sum() * 100
     top_20_cutoff = int(len(product_revenue) * 0.2)
     actual_pct = product_revenue.loc[top_20_cutoff - 1, "cum_pct"]
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    if chart_type == "Line":
+    if chart_type in ["Line", "Trend"]:
         ax.plot(product_revenue.index + 1, product_revenue["cum_pct"], color=color_themes[theme]["primary"])
         ax.axvline(x=top_20_cutoff, color="red", linestyle="--")
         ax.text(top_20_cutoff + 5, actual_pct - 10, f"Top 20% = {actual_pct:.1f}%", color="red")
         ax.set_ylabel("Cumulative % of Total Revenue")
         ax.set_xlabel("Product Rank (Sorted by Revenue)")
-        ax.set_title("Pareto Principle - Testing the 80/20 Rule")
+        ax.set_title("Pareto Principle - Testing the 80/20 Rule" + (f" (last {window} months)" if chart_type == "Trend" else ""))
         ax.yaxis.set_major_formatter(ticker.PercentFormatter())
     else:
         ax.text(0.5, 0.5, "Only available as a Line Chart", ha="center", va="center", fontsize=12)
         ax.set_title("Pareto Plot")
         ax.axis("off")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** Top 20% of products generate {actual_pct:.1f}% of revenue.")
+    render_and_cache("chart_13", params, color, fig, f"**Insight:** Top 20% of products generate {actual_pct:.1f}% of revenue.")
 
 # CHART 13 UI
 with st.expander("📌 Chart 13: Revenue Distribution (Pareto Principle)"):
     chart_type_13 = st.selectbox(
         "📊 Choose chart type (only Line Chart supported):",
-        ["Line", "Bar", "Pie"],
+        ["Line", "Bar", "Pie"] + trend_types,
         index=0,
         key="chart_type_13"
     )
-    chart_13(chart_type_13)
+    chart_13(chart_type_13, trend_window("window_13") if chart_type_13 == "Trend" else 12)
 
 
 # CHART 14: Top 10 Products by % Discount
 def chart_14(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_14", chart_type, color):
+        return
     df_products["discount_amount_pct"] = ((df_products["price"] - df_products["discount_price"]) / df_products["price"]) * 100
     top_discount = df_products.sort_values("discount_amount_pct", ascending=False).head(10)
 
@@ -482,8 +805,7 @@ def chart_14(chart_type):
         ax.set_title("Share of Biggest Discounts")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown("**Insight:** These products are the most heavily discounted.")
+    render_and_cache("chart_14", chart_type, color, fig, "**Insight:** These products are the most heavily discounted.")
 
 # CHART 14 UI
 with st.expander("📌 Chart 14: Top 10 Products by % Discount"):
@@ -499,7 +821,10 @@ with st.expander("📌 Chart 14: Top 10 Products by % Discount"):
 # CHART 15: Cheapest Product by Size Group
 def chart_15(chart_type):
     theme = st.session_state.global_theme
-    cheapest_by_size = df_products.groupby("size")["price"].min().sort_values()
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_15", chart_type, color):
+        return
+    cheapest_by_size = df_products.groupby("size", observed=True)["price"].min().sort_values()
 
     fig, ax = plt.subplots(figsize=(8, 6))
     if chart_type in ["Bar", "Line"]:
@@ -517,8 +842,7 @@ def chart_15(chart_type):
         ax.set_title("Share of Lowest Prices by Size")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown("**Insight:** Small size group offers the lowest price product.")
+    render_and_cache("chart_15", chart_type, color, fig, "**Insight:** Small size group offers the lowest price product.")
 
 # CHART 15 UI
 with st.expander("📌 Chart 15: Cheapest Product by Size Group"):
@@ -535,7 +859,10 @@ with st.expander("📌 Chart 15: Cheapest Product by Size Group"):
 # CHART 16: Manufacturer with Most Reviews (Proxy by Product Count)
 def chart_16(chart_type):
     theme = st.session_state.global_theme
-    review_counts = df_products.groupby("manufacturer").size().sort_values(ascending=False)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_16", chart_type, color):
+        return
+    review_counts = df_products.groupby("manufacturer", observed=True).size().sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -552,8 +879,7 @@ def chart_16(chart_type):
         ax.set_title("Review Volume by Manufacturer")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {review_counts.idxmax()} has the most products — likely most reviews.")
+    render_and_cache("chart_16", chart_type, color, fig, f"**Insight:** {review_counts.idxmax()} has the most products — likely most reviews.")
 
 # CHART 16 UI
 with st.expander("📌 Chart 16: Manufacturer with Most Reviews (Proxy by Product Count)"):
@@ -568,6 +894,9 @@ with st.expander("📌 Chart 16: Manufacturer with Most Reviews (Proxy by Produc
 # CHART 17: Price vs. Weight Scatter Plot
 def chart_17(chart_type):
     theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_17", chart_type, color):
+        return
     fig, ax = plt.subplots(figsize=(10, 6))
 
     if chart_type == "Scatter":
@@ -583,8 +912,7 @@ def chart_17(chart_type):
         ax.set_title("Price vs. Weight")
         ax.axis("off")
 
-    st.pyplot(fig)
-    st.markdown("**Insight:** Most products cluster in the shaded area under 2kg and £150.")
+    render_and_cache("chart_17", chart_type, color, fig, "**Insight:** Most products cluster in the shaded area under 2kg and £150.")
 
 # CHART 17 UI
 with st.expander("📌 Chart 17: Price vs. Weight (Scatter Plot)"):
@@ -597,9 +925,31 @@ with st.expander("📌 Chart 17: Price vs. Weight (Scatter Plot)"):
     chart_17(chart_type_17)
 
 # CHART 18: Top 10 High-Volume Products at the Lowest Prices
-def chart_18(chart_type):
+def chart_18(chart_type, window=12):
     theme = st.session_state.global_theme
-    value_hits = df_products.sort_values(by=["units_sold_12m", "price"], ascending=[False, True]).head(10)
+    color = color_themes[theme]["primary"]
+    if chart_type == "Trend":
+        params = (chart_type, window, history.version)
+        if render_cached("chart_18", params, color):
+            return
+        series = top_products_trend(window, tiebreak_by_price=True)
+        fig = plot_top_products_trend(series, window, "Top 10 High-Volume Products at the Lowest Prices")
+        render_and_cache("chart_18", params, color, fig,
+                         f"**Insight:** {series.iloc[-1].idxmax()} sold the most units last month among these value hits.")
+        return
+    if render_cached("chart_18", chart_type, color):
+        return
+    render_estimate(
+        "chart_18", chart_type, color,
+        lambda df=df_products: approx.Estimate(df.nlargest(10, "units_sold_12m", keep="all")
+                                .sort_values(by=["units_sold_12m", "price"], ascending=[False, True], kind="stable").head(10)),
+        lambda stage: approx_engine().top_n("units_sold_12m", 10, tiebreak="price"),
+        lambda estimate: plot_chart_18(chart_type, theme, estimate),
+        stages=approx.SKETCH_STAGES,
+    )
+
+def plot_chart_18(chart_type, theme, estimate):
+    value_hits = estimate.values
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -615,23 +965,28 @@ def chart_18(chart_type):
         ax.set_title("Best-Selling Cheap Products (Pie)")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown("**Insight:** These products sold the most while also being among the cheapest — high demand for low-cost items.")
+    insight = "**Insight:** These products sold the most while also being among the cheapest — high demand for low-cost items."
+    return fig, insight
 
 # CHART 18 UI
 with st.expander("📌 Chart 18: Top 10 High-Volume Products at the Lowest Prices"):
     chart_type_18 = st.selectbox(
         "📊 Choose chart type (default is recommended):",
-        ["Bar", "Line", "Pie"],
+        ["Bar", "Line", "Pie"] + trend_types,
         index=0,
         key="chart_type_18"
     )
-    chart_18(chart_type_18)
+    chart_18(chart_type_18, trend_window("window_18") if chart_type_18 == "Trend" else 12)
 
-# CHART 19: Products Over £200 per Manufacturer
-def chart_19(chart_type):
+# CHART 19: Products Over a Price Threshold per Manufacturer
+def chart_19(chart_type, threshold=200):
     theme = st.session_state.global_theme
-    high_price_counts = df_products[df_products["price"] > 200].groupby("manufacturer").size().sort_values(ascending=False)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_19", (chart_type, threshold), color):
+        return
+    # One binary search per manufacturer group, all done in a single vectorised lookup
+    high_price_counts = threshold_indexes["price"].group_counts_above(threshold)
+    high_price_counts = high_price_counts[high_price_counts > 0].sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if chart_type in ["Bar", "Line"]:
@@ -641,30 +996,44 @@ def chart_19(chart_type):
             ax.plot(high_price_counts.values, high_price_counts.index, marker="o", color=color_themes[theme]["primary"])
         ax.set_xlabel("Product Count")
         ax.set_ylabel("Manufacturer")
-        ax.set_title("Products Over £200 per Manufacturer")
+        ax.set_title(f"Products Over £{threshold} per Manufacturer")
     else:
         ax.pie(high_price_counts.values, labels=high_price_counts.index, autopct="%1.1f%%",
                colors=[color_themes[theme]["primary"]]*len(high_price_counts))
         ax.set_title("Share of High-End Products")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    st.markdown(f"**Insight:** {high_price_counts.idxmax()} offers the most high-end items.")
+    if high_price_counts.empty:
+        insight = f"**Insight:** No products are priced over £{threshold}."
+    else:
+        insight = f"**Insight:** {high_price_counts.idxmax()} offers the most items over £{threshold}."
+    render_and_cache("chart_19", (chart_type, threshold), color, fig, insight)
 
 # CHART 19 UI
-with st.expander("📌 Chart 19: Products Over £200 per Manufacturer"):
+with st.expander("📌 Chart 19: High-End Products per Manufacturer"):
     chart_type_19 = st.selectbox(
         "📊 Choose chart type (default is recommended):",
         ["Bar", "Line", "Pie"],
         index=0,
         key="chart_type_19"
     )
-    chart_19(chart_type_19)
+    price_threshold_19 = st.slider(
+        "💷 Price threshold (£):",
+        0,
+        max(int(threshold_indexes["price"].max()), 200),
+        200,
+        step=10,
+        key="price_threshold_19"
+    )
+    chart_19(chart_type_19, price_threshold_19)
 
 # CHART 20: Product Size Diversity per Manufacturer
 def chart_20(chart_type):
     theme = st.session_state.global_theme
-    size_dist = df_products.groupby(["manufacturer", "size"]).size().unstack().fillna(0)
+    color = color_themes[theme]["primary"]
+    if render_cached("chart_20", chart_type, color):
+        return
+    size_dist = df_products.groupby(["manufacturer", "size"], observed=True).size().unstack().fillna(0)
 
     fig, ax = plt.subplots(figsize=(12, 6))
     if chart_type == "Bar":
@@ -684,9 +1053,7 @@ def chart_20(chart_type):
         ax.set_title("Overall Size Share (All Manufacturers)")
         ax.set_aspect("equal")
 
-    st.pyplot(fig)
-    plt.close()  # ✅ closes the figure to prevent memory buildup
-    st.markdown("**Insight:** This shows how varied each manufacturer’s product sizing is.")
+    render_and_cache("chart_20", chart_type, color, fig, "**Insight:** This shows how varied each manufacturer’s product sizing is.")
 
 # CHART 20 UI
 with st.expander("📌 Chart 20: Product Size Diversity per Manufacturer"):
@@ -699,10 +1066,108 @@ with st.expander("📌 Chart 20: Product Size Diversity per Manufacturer"):
     chart_20(chart_type_20)
 
 
-import streamlit as st
-import matplotlib.pyplot as plt
-import pandas as pd
-import warnings
+# TOP PRODUCTS PER MANUFACTURER: grouped top-K with drill-down
+def group_topk_chart(metric, k, maker, size):
+    theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    engine = topk_index.metric(metric)
+    params = (metric, k, maker, size, engine.version)
+    if render_cached("group_topk", params, color):
+        return
+    rows, values = engine.group_top(maker, None if size == "All sizes" else size, k)
+    names = df_products["product_name"].take(rows).to_numpy()
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(names[::-1], values[::-1], color=color_themes[theme]["primary"])
+    ax.set_xlabel(group_topk.METRICS[metric])
+    ax.set_title(f"Top {k} {maker} Products by {group_topk.METRICS[metric]}" + ("" if size == "All sizes" else f" ({size})"),
+                 fontsize=14, fontweight="bold")
+    if len(rows):
+        insight = f"**Insight:** {names[0]} leads {maker} with {values[0]:,.2f}."
+    else:
+        insight = f"**Insight:** {maker} has no products with a {group_topk.METRICS[metric].lower()} value."
+    render_and_cache("group_topk", params, color, fig, insight)
+
+topk_index = get_topk_index(dataset_version, df_products)
+topk_index.sync(df_products, data_version)
+
+st.markdown("## 🏆 Top Products per Manufacturer")
+with st.expander("📌 Top K Products per Manufacturer (with drill-down)"):
+    col_metric, col_k = st.columns(2)
+    topk_metric = col_metric.selectbox("📏 Rank products by:", list(group_topk.METRICS),
+                                       format_func=group_topk.METRICS.get, key="topk_metric")
+    topk_k = col_k.slider("🔢 Products per manufacturer:", 1, group_topk.MAX_K, 5, key="topk_k")
+    topk_engine = topk_index.metric(topk_metric)
+
+    per_maker = topk_engine.per_manufacturer(topk_k)
+    st.dataframe(pd.DataFrame({
+        "manufacturer": per_maker["manufacturer"],
+        "rank": per_maker["rank"],
+        "product_name": df_products["product_name"].take(per_maker["row"]).to_numpy(),
+        group_topk.METRICS[topk_metric]: per_maker["value"],
+    }))
+
+    col_maker, col_size = st.columns(2)
+    topk_maker = col_maker.selectbox("🏭 Drill down into manufacturer:", list(topk_engine.makers), key="topk_manufacturer")
+    topk_size = col_size.selectbox("📐 Size:", ["All sizes"] + list(topk_engine.sizes), key="topk_size")
+    group_topk_chart(topk_metric, topk_k, topk_maker, topk_size)
+
+
+# SNAPSHOT COMPARISON: what changed between two catalog versions
+# Cached per snapshot pair (keyed on path, size and mtime) as one shared, read-only object,
+# so reruns don't unpickle a copy; only the last few pairs are kept
+@st.cache_resource(max_entries=2)
+def load_snapshot_diff(old_signature, new_signature):
+    return snapshot_diff.diff_files(old_signature[0], new_signature[0])
+
+# Top-N decreases of one column, in the same style as the other bar charts
+def diff_chart(name, params, changes, column, top_n, title, xlabel, formatter):
+    theme = st.session_state.global_theme
+    color = color_themes[theme]["primary"]
+    if render_cached(name, params, color):
+        return
+    top = snapshot_diff.top_decreases(changes, column, top_n)
+    labels = top["product_name"] + " (" + top["manufacturer"].astype(str) + ")"
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(labels, top[f"{column}_delta"], color=color_themes[theme]["primary"])
+    ax.set_xlabel(xlabel)
+    ax.set_title(title, fontsize=14, fontweight="bold")
+    ax.xaxis.set_major_formatter(ticker.FuncFormatter(formatter))
+    if top.empty:
+        insight = "**Insight:** No decreases between these snapshots."
+    else:
+        insight = f"**Insight:** {labels.iloc[0]} changed the most: {formatter(top[f'{column}_delta'].iloc[0], None)}."
+    render_and_cache(name, params, color, fig, insight)
+
+st.markdown("## 🔁 Snapshot Comparison")
+snapshot_paths = snapshot_diff.list_snapshots()
+if len(snapshot_paths) < 2:
+    st.info(f"Add dated copies of products.csv to `{snapshot_diff.SNAPSHOT_DIR}/` to compare catalog versions.")
+else:
+    with st.expander("📌 Compare two catalog snapshots"):
+        col_old, col_new = st.columns(2)
+        old_snapshot = col_old.selectbox("Older snapshot:", snapshot_paths, index=len(snapshot_paths) - 2, key="snapshot_old")
+        new_snapshot = col_new.selectbox("Newer snapshot:", snapshot_paths, index=len(snapshot_paths) - 1, key="snapshot_new")
+        pair = (snapshot_diff.signature(old_snapshot), snapshot_diff.signature(new_snapshot))
+        diff = load_snapshot_diff(*pair)
+        changes = diff["changes"]
+
+        col_1, col_2, col_3, col_4 = st.columns(4)
+        col_1.metric("Products in both", f"{len(changes):,}")
+        col_2.metric("New products", f"{len(diff['added']):,}")
+        col_3.metric("Removed products", f"{len(diff['removed']):,}")
+        col_4.metric("Price changes", f"{int((changes['price_delta'] != 0).sum()):,}")
+
+        st.subheader("Changes per Manufacturer")
+        st.dataframe(diff["summary"])
+
+        top_n = st.slider("🔢 Products per list:", 5, 25, 10, key="snapshot_top_n")
+        diff_chart("diff_price_cuts", (pair, top_n), changes, "price", top_n,
+                   f"Top {top_n} Biggest Price Cuts", "Price Change (£)", lambda x, _: f"£{x:.0f}")
+        diff_chart("diff_stock_drops", (pair, top_n), changes, "stock_level", top_n,
+                   f"Top {top_n} Largest Stock Drops", "Stock Change (units)", lambda x, _: f"{x:,.0f}")
+
 
 # Suppress seaborn/pandas warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -710,6 +1175,18 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 # Section title
 st.markdown("## 🧠 Sentiment Analysis")
 
+# Pull newly arrived reviews into the live sentiment scores
+if st.button("📥 Ingest new reviews"):
+    start = time.perf_counter()
+    n_reviews, affected = sentiment_pipeline.ingest(sentiment_store)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if n_reviews:
+        data_version = (dataset_version, sentiment_store.version)
+        df_products = load_live_data(data_version, products).copy(deep=False)
+        st.success(f"Scored {n_reviews:,} reviews for {len(affected):,} products in {elapsed:.2f}s ({n_reviews / elapsed:,.0f} reviews/s).")
+    else:
+        st.info(f"No new reviews found in `{sentiment_pipeline.REVIEWS_DIR}/`.")
+
 # Session state for chart toggle
 if "show_sentiment_chart_1" not in st.session_state:
     st.session_state.show_sentiment_chart_1 = False
@@ -780,7 +1257,7 @@ st.title("Average Sentiment Score per Manufacturer")
 if st.button("Show Average Sentiment by Manufacturer"):
     
     # Calculate the average sentiment score per manufacturer
-    avg_sentiment_manufacturer = df_products.groupby("manufacturer")["avg_sentiment"].mean().sort_values()
+    avg_sentiment_manufacturer = df_products.groupby("manufacturer", observed=True)["avg_sentiment"].mean().sort_values()
 
     # Create the bar plot
     plt.figure(figsize=(10, 6))
@@ -805,7 +1282,7 @@ st.title("Best and Worst Sentiment Score per Manufacturer")
 if st.button("Show Best and Worst Sentiment per Manufacturer"):
     
     # Calculate best and worst sentiment per manufacturer
-    summary = df_products.groupby("manufacturer").agg(
+    summary = df_products.groupby("manufacturer", observed=True).agg(
         best_sentiment=('avg_sentiment', 'max'),
         worst_sentiment=('avg_sentiment', 'min')
     ).reset_index()
@@ -842,21 +1319,25 @@ st.title("Sentiment Distribution of Products")
 # Streamlit: Button to trigger chart display
 if st.button("Show Sentiment Distribution by Product"):
     
-    # Create sentiment bands
-    df_products["sentiment_band"] = pd.cut(
-        df_products["avg_sentiment"], 
-        bins=[-1, -0.8, -0.6, -0.4, -0.2, 0, 0.2, 0.4, 0.6, 0.8, 1],
-        labels=["-1 to -0.8", "-0.8 to -0.6", "-0.6 to -0.4", "-0.4 to -0.2", "-0.2 to 0",
-                "0 to 0.2", "0.2 to 0.4", "0.4 to 0.6", "0.6 to 0.8", "0.8 to 1"],
-        include_lowest=True
-    )
-
-    # Count products in each sentiment band
-    sentiment_distribution = df_products["sentiment_band"].value_counts().sort_index()
+    band_edges = [-1, -0.8, -0.6, -0.4, -0.2, 0, 0.2, 0.4, 0.6, 0.8, 1]
+    band_labels = ["-1 to -0.8", "-0.8 to -0.6", "-0.6 to -0.4", "-0.4 to -0.2", "-0.2 to 0",
+                   "0 to 0.2", "0.2 to 0.4", "0.4 to 0.6", "0.6 to 0.8", "0.8 to 1"]
+    band_error = 0
+    if approx_mode:
+        # Band counts from the mergeable quantile sketch (no full sort of the column)
+        sketch = get_sentiment_sketch(data_version, df_products)
+        band_counts = pd.Series(sketch.cdf(band_edges)).diff().iloc[1:] * sketch.n
+        sentiment_distribution = pd.Series(band_counts.round().astype(int).values, index=band_labels)
+        band_error = 2 * sketch.rank_error() * sketch.n
+    else:
+        # Count products in each sentiment band (right-closed, lowest band includes -1) from the sorted index
+        sentiment_index = get_sentiment_index(data_version, df_products)
+        sentiment_distribution = pd.Series(sentiment_index.histogram(band_edges, right=True), index=band_labels)
 
     # Plot the distribution
     plt.figure(figsize=(12, 6))
-    plt.bar(sentiment_distribution.index.astype(str), sentiment_distribution.values, color="#3498DB")  # solid blue
+    plt.bar(sentiment_distribution.index.astype(str), sentiment_distribution.values, color="#3498DB",
+            yerr=band_error or None)  # solid blue
     plt.title("Distribution of Products by Sentiment Band", fontsize=14, fontweight="bold")
     plt.xlabel("Sentiment Score Range")
     plt.ylabel("Number of Products")
@@ -868,10 +1349,20 @@ if st.button("Show Sentiment Distribution by Product"):
     st.pyplot(plt)
     plt.close()  # ✅ Close the figure to prevent memory warnings
 
-    # Optional cleanup
-    df_products.drop(columns="sentiment_band", inplace=True)
-
     # Insight
     most_popular = sentiment_distribution.idxmax()
-    st.markdown(f"📊 Insight: Most products fall into the sentiment range: {most_popular}.")
+    insight = f"📊 Insight: Most products fall into the sentiment range: {most_popular}."
+    if band_error:
+        insight += f"  \n⚡ _Approximate (quantile sketch): each band count is within ±{band_error:,.0f} products._"
+    st.markdown(insight)
+
+
+# Startup time breakdown for this process (first run only; reruns reuse loaded modules)
+mark(f"first full run (since {PROCESS_START_LABEL})")
+with st.expander("⏱️ Startup time breakdown"):
+    st.caption(f"Fast-start mode: {'on' if FAST_START else 'off'} (set FAST_START=0 to import everything eagerly). "
+               "Most of the saving comes from the persistent matplotlib font cache.")
+    st.table(pd.DataFrame([(step, f"{seconds * 1000:.1f} ms") for step, seconds in startup_report()], columns=["Step", "Time"]))
 
+# Approximate charts are refined last, once the whole page is on screen
+refine_pending()
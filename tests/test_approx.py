@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import approx
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    makers = np.array(["Acme", "Globex", "Initech", "Umbrella", "Hooli"])
+    maker = rng.integers(len(makers), size=n)
+    return pd.DataFrame({
+        "manufacturer": makers[maker],
+        "size": np.array(["Small", "Medium", "Large"])[rng.integers(3, size=n)],
+        "price": rng.normal(50 + 20 * maker, 15),
+        "units_sold_12m": rng.integers(0, 40, size=n).astype(float),
+    })
+
+
+def max_rank_error(sketch, values):
+    values = np.sort(values)
+    qs = np.linspace(0.01, 0.99, 99)
+    true_ranks = np.searchsorted(values, sketch.quantiles(qs), side="right") / len(values)
+    return np.abs(true_ranks - qs).max()
+
+
+@pytest.mark.parametrize("chunk", [1_000_000, 1_000])
+def test_quantile_sketch_within_rank_error(monkeypatch, chunk):
+    monkeypatch.setattr(approx, "CHUNK_ROWS", chunk)
+    values = np.random.default_rng(1).lognormal(3, 1, size=200_000)
+    sketch = approx.QuantileSketch().update(values)
+    assert sketch.n == len(values)
+    assert max_rank_error(sketch, values) <= sketch.rank_error()
+
+
+def test_merged_sketches_within_rank_error():
+    values = np.random.default_rng(2).normal(size=200_000)
+    sketch = approx.QuantileSketch(seed=0).update(values[:120_000]).merge(approx.QuantileSketch(seed=1).update(values[120_000:]))
+    assert max_rank_error(sketch, values) <= sketch.rank_error()
+
+
+@pytest.mark.parametrize("n", [1, 10, 37])
+def test_top_k_lists_match_nlargest_with_ties(monkeypatch, n):
+    monkeypatch.setattr(approx, "CHUNK_ROWS", 500)
+    df = catalog(5_000)
+    df.loc[::97, "units_sold_12m"] = np.nan
+    # Heavily tied values, fed in chunks and in two merged halves
+    lists = approx.TopKLists(k=40).update(df["units_sold_12m"])
+    assert lists.rows[:n].tolist() == df["units_sold_12m"].nlargest(n).index.tolist()
+
+    half = len(df) // 2
+    merged = approx.TopKLists(k=40).update(df["units_sold_12m"][:half]).merge(
+        approx.TopKLists(k=40).update(df["units_sold_12m"][half:], offset=half))
+    assert merged.rows[:n].tolist() == lists.rows[:n].tolist()
+
+    with_tiebreak = approx.TopKLists(k=40).update(df["units_sold_12m"], df["price"])
+    expected = (df.nlargest(n, "units_sold_12m", keep="all")
+                .sort_values(["units_sold_12m", "price"], ascending=[False, True], kind="stable").head(n))
+    assert with_tiebreak.rows[:n].tolist() == expected.index.tolist()
+
+
+def test_engine_top_n_is_exact():
+    df = catalog(3_000)
+    engine = approx.ApproxEngine(df)
+    try:
+        pd.testing.assert_frame_equal(engine.top_n("units_sold_12m", 10).values, df.nlargest(10, "units_sold_12m"))
+    finally:
+        engine.executor.shutdown()
+
+
+def test_sampler_is_built_only_when_asked_for():
+    engine = approx.ApproxEngine(catalog(1_000))
+    try:
+        assert engine.sampler_future is None
+        engine.group_stat("price", "mean")
+        assert engine.sampler_future is None
+        engine.group_stat("price", "mean", 0.1)
+        assert engine.sampler_future is not None
+    finally:
+        engine.executor.shutdown()
+
+
+def test_samples_are_nested():
+    sampler = approx.StratifiedSampler(catalog(10_000), ("manufacturer", "size"))
+    small, _ = sampler.take(0.01)
+    large, _ = sampler.take(0.1)
+    assert set(small) <= set(large)
+    # Every stratum gets at least MIN_PER_STRATUM rows (or all of them)
+    _, n_h = sampler.take(0.001)
+    assert (n_h >= np.minimum(sampler.sizes, approx.MIN_PER_STRATUM) * 0.5).all()
+
+
+@pytest.mark.parametrize("stat", ["mean", "sum"])
+def test_stratified_intervals_cover_the_exact_answer(stat):
+    df = catalog(30_000)
+    exact = approx.ApproxEngine(df).group_stat("price", stat).values
+    covered = trials = 0
+    for seed in range(100):
+        engine = approx.ApproxEngine(df, seed=seed)
+        estimate = engine.group_stat("price", stat, 0.05)
+        engine.executor.shutdown()
+        assert estimate.values.index.tolist() == exact.index.tolist()
+        covered += int((np.abs(estimate.values - exact) <= estimate.error).sum())
+        trials += len(exact)
+    # Nominal 95% intervals
+    assert covered / trials >= 0.9
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pytest
+
+import chart_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "synthetic_analyis.py")
+
+
+def artist_colors(chart):
+    for artist, setter in chart.artists:
+        value = getattr(artist, setter.replace("set_", "get_"))()
+        yield value[0] if np.ndim(value) == 2 else value
+
+
+def test_errorbars_are_recoloured():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.errorbar([1, 2, 3], [0, 1, 2], xerr=[0.1, 0.2, 0.3], color="#1f77b4", marker="o")
+    artists = chart_cache.themed_artists(fig, "#1f77b4")
+    assert any(setter == "set_edgecolor" for _, setter in artists)
+    for artist, setter in artists:
+        getattr(artist, setter)("#e74c3c")
+    for collection in ax.collections:
+        assert all(chart_cache._same_color(ec, "#e74c3c") for ec in collection.get_edgecolors())
+    plt.close(fig)
+
+
+def test_theme_switch_restyles_cached_figures(monkeypatch):
+    AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+    monkeypatch.chdir(ROOT)
+    monkeypatch.delenv("PRODUCTS_SHM", raising=False)
+
+    at = AppTest.from_file(APP, default_timeout=300).run()
+    assert not at.exception
+    first = dict(at.session_state[chart_cache.CACHE_KEY])
+    assert {f"chart_{i}" for i in range(1, 21)} <= first.keys()
+    assert len(first) < chart_cache.MAX_CACHED_CHARTS
+
+    # A plain rerun reuses every figure
+    at.run()
+    assert {name: chart.fig for name, chart in at.session_state[chart_cache.CACHE_KEY].items()} == \
+        {name: chart.fig for name, chart in first.items()}
+
+    theme_box = next(box for box in at.selectbox if "theme" in box.label)
+    for theme in [option for option in theme_box.options if option != theme_box.value][:2]:
+        previous = {name: chart.color for name, chart in first.items()}
+        theme_box.set_value(theme)
+        at.run()
+        assert not at.exception
+        cached = at.session_state[chart_cache.CACHE_KEY]
+        assert cached.keys() == first.keys()
+        for name, chart in cached.items():
+            # Same figure object, recoloured in place
+            assert chart.fig is first[name].fig
+            assert chart.color != previous[name]
+            assert all(chart_cache._same_color(color, chart.color) for color in artist_colors(chart))
+        theme_box = next(box for box in at.selectbox if "theme" in box.label)
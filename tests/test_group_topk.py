@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import group_topk
+from group_topk import GroupTopK
+
+
+def catalog(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 50, size=n).astype(float)  # plenty of ties
+    values[rng.random(n) < 0.05] = np.nan
+    return (values,
+            np.array(["Acme", "Globex", "Initech", "Umbrella"])[rng.integers(4, size=n)],
+            np.array(["Small", "Medium", "Large"])[rng.integers(3, size=n)])
+
+
+# Best k row positions per group from scratch: value descending, ties to the earlier row
+def expected_top(values, keys, k):
+    series = pd.Series(values).dropna()
+    by = [key[series.index] for key in keys]
+    return {key: group.nlargest(k).index.tolist() for key, group in series.groupby(by if len(by) > 1 else by[0])}
+
+
+def assert_matches(engine, values, makers, sizes, k=group_topk.MAX_K):
+    for maker, rows in expected_top(values, [makers], k).items():
+        got, got_values = engine.group_top(maker, k=k)
+        assert got.tolist() == rows, maker
+        np.testing.assert_array_equal(got_values, values[rows])
+    for (maker, size), rows in expected_top(values, [makers, sizes], k).items():
+        assert engine.group_top(maker, size, k)[0].tolist() == rows, (maker, size)
+
+    per_maker = engine.per_manufacturer(k)
+    for maker, rows in expected_top(values, [makers], k).items():
+        assert per_maker.loc[per_maker["manufacturer"] == maker, "row"].tolist() == rows
+    assert engine.overall(k)[0].tolist() == pd.Series(values).nlargest(k).index.tolist()
+
+
+def test_fresh_build_matches_groupby_nlargest():
+    values, makers, sizes = catalog()
+    engine = GroupTopK(values, makers, sizes)
+    assert_matches(engine, values, makers, sizes)
+    assert_matches(engine, values, makers, sizes, k=3)
+
+
+@pytest.mark.parametrize("n_changed", [5, 400])  # merged per group / full rebuild
+def test_updates_match_a_fresh_groupby(n_changed):
+    values, makers, sizes = catalog()
+    engine = GroupTopK(values, makers, sizes)
+    rng = np.random.default_rng(1)
+
+    # Inserts: rows without a value get one, some of them into the top-K
+    missing = np.flatnonzero(np.isnan(values))[:n_changed]
+    inserted = rng.integers(40, 60, size=len(missing)).astype(float)
+    engine.update(missing, inserted)
+    values[missing] = inserted
+    assert_matches(engine, values, makers, sizes)
+
+    # Updates that move current top-K members out of it
+    top_rows = engine.top_rows[engine.top_rows >= 0]
+    demoted = rng.choice(top_rows, size=min(n_changed, len(top_rows)), replace=False)
+    engine.update(demoted, np.zeros(len(demoted)))
+    values[demoted] = 0.0
+    assert_matches(engine, values, makers, sizes)
+
+    # Deletes: values removed (NaN), including current top-K members
+    top_rows = engine.top_rows[engine.top_rows >= 0]
+    deleted = np.unique(np.concatenate([top_rows[:n_changed], rng.integers(len(values), size=n_changed)]))
+    engine.update(deleted, np.full(len(deleted), np.nan))
+    values[deleted] = np.nan
+    assert_matches(engine, values, makers, sizes)
+
+
+def test_index_sync_follows_a_changed_table():
+    values, makers, sizes = catalog(500)
+    df = pd.DataFrame({"manufacturer": makers, "size": sizes, "avg_sentiment": values / 50})
+    index = group_topk.TopKIndex(df)
+    engine = index.metric("sentiment")
+    version = engine.version
+
+    changed = df.copy()
+    changed.loc[changed.index[:10], "avg_sentiment"] = 1.5
+    changed.loc[changed.index[10:15], "avg_sentiment"] = np.nan
+    index.sync(changed, "v2")
+    assert engine.version > version
+    assert_matches(engine, changed["avg_sentiment"].to_numpy(), makers, sizes)
+
+    # Same version again: nothing to merge
+    index.sync(changed, "v2")
+    assert index.synced == "v2"
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sales_history
+
+PRODUCTS = pd.DataFrame({
+    "product_id": ["a", "b", "c"],
+    "manufacturer": ["X", "Y", "X"],
+    "price": [1.0, 2.0, 3.0],
+})
+
+
+def write_month(history_dir, month, units):
+    pd.DataFrame({"product_id": ["a", "b", "c"], "units_sold": units}).to_csv(history_dir / f"{month}.csv", index=False)
+
+
+def test_nothing_allocated_without_history():
+    history = sales_history.SalesHistory(PRODUCTS)
+    assert all(a is None for a in history.cum.values())
+    assert (history.window_totals("units", 12) == 0).all()
+    assert history.manufacturer_series("units").empty
+
+
+def test_window_totals_and_series(tmp_path):
+    for month, units in [("2024-11", [1, 2, 3]), ("2024-12", [4, 5, 6]), ("2025-01", [7, 8, 9])]:
+        write_month(tmp_path, month, units)
+    history = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    assert history.months == ["2024-11", "2024-12", "2025-01"]
+    assert history.window_totals("units", 2).tolist() == [11, 13, 15]
+    assert history.product_series("units", [1]).iloc[:, 0].tolist() == [2, 5, 8]
+    assert history.manufacturer_series("revenue", 3).iloc[-1].tolist() == [1 * 12 + 3 * 18, 2 * 15]
+
+    restored = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    assert restored.months == history.months
+    np.testing.assert_array_equal(restored.window_totals("units", 12), history.window_totals("units", 12))
+
+
+def test_gap_waits_for_the_missing_month(tmp_path):
+    write_month(tmp_path, "2024-01", [1, 1, 1])
+    write_month(tmp_path, "2024-03", [3, 3, 3])
+    with pytest.warns(UserWarning, match="2024-02"):
+        history = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    assert history.months == ["2024-01"]
+    assert "2024-03" in history.skipped
+
+    write_month(tmp_path, "2024-02", [2, 2, 2])
+    assert history.refresh(str(tmp_path)) == ["2024-02", "2024-03"]
+    assert history.skipped == {}
+    assert history.window_totals("units", 2).tolist() == [5, 5, 5]
+
+
+def test_late_older_month_is_reported(tmp_path):
+    write_month(tmp_path, "2024-05", [1, 1, 1])
+    history = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    write_month(tmp_path, "2024-04", [1, 1, 1])
+    with pytest.warns(UserWarning, match="2024-04"):
+        history.refresh(str(tmp_path))
+    assert list(history.skipped) == ["2024-04"]
+
+
+def test_append_rejects_non_consecutive_months():
+    history = sales_history.SalesHistory(PRODUCTS)
+    history.append_month("2024-12", pd.DataFrame({"product_id": ["a"], "units_sold": [1]}))
+    with pytest.raises(ValueError):
+        history.append_month("2025-02", pd.DataFrame({"product_id": ["a"], "units_sold": [1]}))
+
+
+def test_per_product_memory_is_bounded(tmp_path):
+    month = "2022-01"
+    monthly = []
+    for i in range(30):
+        units = [i, 2 * i, 3 * i]
+        write_month(tmp_path, month, units)
+        monthly.append(units)
+        month = sales_history.next_month(month)
+    history = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    assert len(history) == 30
+    assert all(a.shape == (sales_history.KEPT_PREFIXES, 3) for a in history.cum.values())
+
+    for window in sales_history.WINDOWS:
+        expected = np.sum(monthly[-window:], axis=0)
+        assert history.window_totals("units", window).tolist() == expected.tolist()
+    series = history.product_series("units", [0, 2])
+    assert series.index.tolist() == history.months[-12:]
+    assert series.to_numpy().tolist() == [[row[0], row[2]] for row in monthly[-12:]]
+    # The manufacturer series keeps the whole history
+    assert history.manufacturer_series("units")["Y"].tolist() == [row[1] for row in monthly]
+
+    restored = sales_history.SalesHistory.load(PRODUCTS, str(tmp_path))
+    assert restored.months == history.months
+    for window in sales_history.WINDOWS:
+        assert restored.window_totals("revenue", window).tolist() == history.window_totals("revenue", window).tolist()
+    pd.testing.assert_frame_equal(restored.manufacturer_series("revenue", 12), history.manufacturer_series("revenue", 12))
+    with pytest.raises(ValueError):
+        history.window_totals("units", 12, end=10)
@@ -0,0 +1,120 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sentiment_pipeline
+from sentiment_pipeline import SentimentStore, ingest, score_texts
+
+
+def write_reviews(path, reviews, terminated=True, mode="a"):
+    body = "\n".join(json.dumps(review) if isinstance(review, dict) else review for review in reviews)
+    with open(path, mode) as f:
+        f.write(body + ("\n" if terminated else ""))
+
+
+def test_tokenizer_lowercases_and_splits_on_non_word_bytes():
+    hashes, review = sentiment_pipeline.tokenize(["Love it!", "", "LOVE, don't"])
+    expected, _ = sentiment_pipeline.tokenize(["love", "it", "love", "don't"])
+    assert hashes.tolist() == [expected[0], expected[1], expected[0], expected[3]]
+    assert review.tolist() == [0, 0, 2, 2]
+
+
+def test_scores_follow_the_lexicon_and_negations():
+    good, bad, neutral, negated, separated = score_texts(
+        ["Great, works well", "terrible and broken", "it arrived on monday", "not great", "not really great"])
+    assert good > 0 > bad
+    assert neutral == 0
+    # A negation directly before a lexicon word flips and damps it
+    great = 3.1
+    assert negated == pytest.approx(great * -0.74 / np.sqrt((great * 0.74) ** 2 + 15))
+    # ...but only when it comes directly before it
+    assert separated == pytest.approx(great / np.sqrt(great ** 2 + 15))
+    # Negations don't cross review boundaries
+    assert score_texts(["not", "great"])[1] == score_texts(["great"])[0]
+
+
+def test_offsets_make_ingest_incremental(tmp_path):
+    path = tmp_path / "a.jsonl"
+    write_reviews(path, [{"product_id": "P1", "text": "great"}, {"product_id": "P2", "text": "awful"}])
+    store = SentimentStore()
+    assert ingest(store, str(tmp_path))[0] == 2
+    assert ingest(store, str(tmp_path))[0] == 0
+    write_reviews(path, [{"product_id": "P1", "text": "terrible"}])
+    n_reviews, affected = ingest(store, str(tmp_path))
+    assert (n_reviews, set(affected)) == (1, {"P1"})
+    assert store.to_frame().loc["P1", "review_count"] == 2
+
+    # A restarted store continues from the saved offsets
+    restarted = SentimentStore.load(*sentiment_pipeline.state_paths(str(tmp_path)))
+    assert ingest(restarted, str(tmp_path))[0] == 0
+    pd.testing.assert_frame_equal(restarted.to_frame(), store.to_frame(), check_index_type=False)
+
+
+def test_unterminated_last_line_waits_until_the_file_stops_changing(tmp_path):
+    path = tmp_path / "a.jsonl"
+    write_reviews(path, [{"product_id": "P1", "text": "great"}, {"product_id": "P2", "text": "good"}], terminated=False)
+    store = SentimentStore()
+    assert ingest(store, str(tmp_path))[0] == 1
+    # Unchanged since the last ingest: the tail is complete
+    assert ingest(store, str(tmp_path))[0] == 1
+    assert ingest(store, str(tmp_path))[0] == 0
+    assert set(store.ids) == {"P1", "P2"}
+
+
+def test_malformed_lines_are_skipped_and_state_saved(tmp_path):
+    path = tmp_path / "a.jsonl"
+    write_reviews(path, [{"product_id": "P1", "text": "great"}, "{not json", {"text": "no product"},
+                         {"product_id": "P2", "text": "bad"}])
+    store = SentimentStore()
+    with pytest.warns(UserWarning, match="2 malformed"):
+        assert ingest(store, str(tmp_path))[0] == 2
+    restarted = SentimentStore.load(*sentiment_pipeline.state_paths(str(tmp_path)))
+    assert ingest(restarted, str(tmp_path))[0] == 0
+    assert restarted.to_frame()["review_count"].sum() == 2
+
+
+def test_truncated_file_is_read_again(tmp_path):
+    path = tmp_path / "a.jsonl"
+    write_reviews(path, [{"product_id": "P1", "text": "great"}] * 3)
+    store = SentimentStore()
+    ingest(store, str(tmp_path))
+    write_reviews(path, [{"product_id": "P2", "text": "awful"}], mode="w")
+    with pytest.warns(UserWarning, match="shrank"):
+        assert ingest(store, str(tmp_path))[0] == 1
+    assert store.to_frame().loc["P2", "review_count"] == 1
+
+
+def test_replicas_share_ingested_state(tmp_path):
+    paths = sentiment_pipeline.state_paths(str(tmp_path))
+    first, second = SentimentStore.load(*paths), SentimentStore.load(*paths)
+    write_reviews(tmp_path / "a.jsonl", [{"product_id": "P1", "text": "great"}])
+    assert ingest(first, str(tmp_path))[0] == 1
+    # The other replica neither re-counts those reviews nor misses them
+    assert ingest(second, str(tmp_path))[0] == 0
+    assert second.to_frame().loc["P1", "review_count"] == 1
+
+    write_reviews(tmp_path / "a.jsonl", [{"product_id": "P1", "text": "awful"}])
+    ingest(second, str(tmp_path))
+    version = first.version
+    assert first.refresh(*paths)
+    assert first.version > version
+    assert first.to_frame().loc["P1", "review_count"] == 2
+    assert not first.refresh(*paths)
+
+
+def test_apply_to_overrides_only_products_with_reviews(tmp_path):
+    products = pd.DataFrame({"product_id": ["P1", "P2", "P3"], "price": [1.0, 2.0, 3.0],
+                             "avg_sentiment": [0.1, 0.2, 0.3]})
+    store = SentimentStore()
+    assert sentiment_pipeline.apply_to(products, store) is products
+
+    write_reviews(tmp_path / "a.jsonl", [{"product_id": "P2", "text": "terrible"}, {"product_id": "P9", "text": "great"}])
+    ingest(store, str(tmp_path))
+    live = sentiment_pipeline.apply_to(products, store)
+    assert live["avg_sentiment"].tolist()[0::2] == [0.1, 0.3]
+    assert live["avg_sentiment"].iloc[1] == pytest.approx(score_texts(["terrible"])[0])
+    # The input is untouched and other columns are shared, not copied
+    assert products["avg_sentiment"].tolist() == [0.1, 0.2, 0.3]
+    assert np.shares_memory(live["price"].to_numpy(), products["price"].to_numpy())
@@ -0,0 +1,133 @@
+import gc
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import shared_data
+
+
+def catalog(n, price):
+    return pd.DataFrame({
+        "product_id": [f"P{i:05d}" for i in range(n)],
+        "manufacturer": np.array(["Acme", "Globex", "Initech"])[np.arange(n) % 3],
+        "price": np.full(n, price),
+        "stock_level": np.arange(n),
+    })
+
+
+@pytest.fixture
+def publisher(tmp_path):
+    publisher = shared_data.Publisher(str(tmp_path))
+    yield publisher
+    publisher.close()
+
+
+def test_retired_frame_stays_readable_after_swap(publisher, tmp_path):
+    subscriber = shared_data.Subscriber(str(tmp_path))
+    publisher.publish(catalog(1000, 2.5))
+    v1, old = subscriber.frame()
+    shallow = old.copy(deep=False)
+
+    publisher.publish(catalog(1000, 4.0))
+    v2, new = subscriber.frame()
+    assert v2 != v1
+    publisher.collect()
+
+    # The old version is still leased and mapped while its frames are alive
+    assert old["price"].sum() == pytest.approx(2500.0)
+    assert shallow["stock_level"].sum() == sum(range(1000))
+    assert new["price"].sum() == pytest.approx(4000.0)
+    assert publisher.leases().get(v1) == 1
+
+
+def test_retired_version_freed_once_unreferenced(publisher, tmp_path):
+    subscriber = shared_data.Subscriber(str(tmp_path))
+    publisher.publish(catalog(100, 1.0))
+    v1, old = subscriber.frame()
+    publisher.publish(catalog(100, 2.0))
+    subscriber.frame()
+
+    del old
+    gc.collect()
+    assert v1 not in publisher.leases()
+    publisher.collect()
+    assert v1 not in publisher.segments
+    assert not os.path.exists(os.path.join(str(tmp_path), "leases", f"{v1}.{os.getpid()}"))
+
+
+def test_concurrent_frames_attach_each_version_once(publisher, tmp_path):
+    subscriber = shared_data.Subscriber(str(tmp_path))
+    publisher.publish(catalog(100, 1.0))
+    subscriber.frame()
+    v2 = publisher.publish(catalog(100, 2.0))
+
+    barrier = threading.Barrier(8)
+    versions = []
+
+    def session():
+        barrier.wait()
+        versions.append(subscriber.frame()[0])
+
+    threads = [threading.Thread(target=session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del thread
+    gc.collect()
+
+    assert versions == [v2] * 8
+    # One lease for the current version; the old one was released exactly once
+    assert os.listdir(os.path.join(str(tmp_path), "leases")) == [f"{v2}.{os.getpid()}"]
+
+
+# Numpy arrays behind a column: values, Categorical codes or Arrow string buffers
+def column_buffers(series):
+    array = series.array
+    if isinstance(array, pd.Categorical):
+        return [array.codes]
+    if hasattr(array, "_pa_array"):
+        chunk = array._pa_array.chunk(0)
+        return [np.frombuffer(buffer, dtype=np.uint8) for buffer in chunk.buffers() if buffer is not None]
+    return [series.to_numpy()]
+
+
+def test_every_column_is_zero_copy(publisher, tmp_path):
+    pytest.importorskip("pyarrow")
+    subscriber = shared_data.Subscriber(str(tmp_path))
+    df = catalog(1000, 1.0)
+    df["product_name"] = [f"Gadget {i}" for i in range(1000)]
+    df["size"] = np.array(["Small", "Medium", "Large"])[np.arange(1000) % 3]
+    publisher.publish(df)
+    _, shared = subscriber.frame()
+
+    segment = np.frombuffer(subscriber.current.shm.buf, dtype=np.uint8)
+    try:
+        for name in shared.columns:
+            for buffer in column_buffers(shared[name]):
+                assert np.shares_memory(buffer, segment), name
+        assert isinstance(shared["manufacturer"].dtype, pd.CategoricalDtype)
+        assert shared["product_id"].tolist() == df["product_id"].tolist()
+        assert shared["manufacturer"].astype(str).tolist() == df["manufacturer"].tolist()
+    finally:
+        del segment
+
+
+def test_round_trip_keeps_missing_strings_and_bools(publisher, tmp_path):
+    subscriber = shared_data.Subscriber(str(tmp_path))
+    df = catalog(1000, 1.0)
+    df["product_name"] = [None if i % 7 == 0 else f"Gadget {i}" for i in range(1000)]
+    df["size"] = [None if i % 5 == 0 else ["Small", "Large"][i % 2] for i in range(1000)]
+    df["in_stock"] = np.arange(1000) % 2 == 0
+    publisher.publish(df)
+    _, shared = subscriber.frame()
+
+    for name in ["product_name", "size"]:
+        assert shared[name].isna().tolist() == df[name].isna().tolist(), name
+        assert shared[name].dropna().astype(str).tolist() == df[name].dropna().tolist(), name
+    assert shared["in_stock"].dtype == bool
+    assert shared["in_stock"].tolist() == df["in_stock"].tolist()
+    assert shared.groupby("size", observed=True).size().to_dict() == df.groupby("size").size().to_dict()
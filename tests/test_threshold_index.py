@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from threshold_index import ThresholdIndex, build_indexes
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 40, size=3_000).astype(float)  # ties on every value
+    values[rng.random(len(values)) < 0.03] = np.nan
+    groups = np.array(["Acme", "Globex", "Initech"])[rng.integers(3, size=len(values))]
+    return values, groups
+
+
+THRESHOLDS = [-5, 0, 0.5, 7, 12, 39, 39.5, 100]
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_counts_match_boolean_masks(data, threshold):
+    values, groups = data
+    index = ThresholdIndex(values, groups)
+    assert len(index) == np.count_nonzero(~np.isnan(values))
+    assert index.count_below(threshold) == np.count_nonzero(values < threshold)
+    assert index.count_below(threshold, inclusive=True) == np.count_nonzero(values <= threshold)
+    assert index.count_above(threshold) == np.count_nonzero(values > threshold)
+    assert index.count_above(threshold, inclusive=True) == np.count_nonzero(values >= threshold)
+    assert index.count_between(threshold, threshold + 10) == np.count_nonzero((values >= threshold) & (values < threshold + 10))
+    np.testing.assert_array_equal(index.values_below(threshold), np.sort(values[values < threshold]))
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@pytest.mark.parametrize("inclusive", [False, True])
+def test_group_counts_match_groupby_masks(data, threshold, inclusive):
+    values, groups = data
+    index = ThresholdIndex(values, groups)
+    valid = ~np.isnan(values)
+    below = values[valid] <= threshold if inclusive else values[valid] < threshold
+    above = values[valid] >= threshold if inclusive else values[valid] > threshold
+    expected_below = pd.Series(below).groupby(groups[valid]).sum()
+    expected_above = pd.Series(above).groupby(groups[valid]).sum()
+    assert index.group_counts_below(threshold, inclusive).to_dict() == expected_below.to_dict()
+    assert index.group_counts_above(threshold, inclusive).to_dict() == expected_above.to_dict()
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@pytest.mark.parametrize("inclusive", [False, True])
+def test_distinct_counts_match_value_counts(data, threshold, inclusive):
+    values, groups = data
+    index = ThresholdIndex(values, groups)
+    matching = values[values <= threshold] if inclusive else values[values < threshold]
+    expected = pd.Series(matching).value_counts().sort_index()
+    counts = index.distinct_counts_below(threshold, inclusive)
+    assert counts.index.tolist() == expected.index.tolist()
+    assert counts.tolist() == expected.tolist()
+
+
+def test_histograms_match_masks(data):
+    values, groups = data
+    index = ThresholdIndex(values, groups)
+    edges = [0, 5, 10, 20, 30]
+    # [a, b) with the last bin open-ended
+    expected = [np.count_nonzero((values >= a) & (values < b)) for a, b in zip(edges[:-2], edges[1:-1])]
+    expected.append(np.count_nonzero(values >= edges[-2]))
+    assert index.histogram(edges).tolist() == expected
+    # (a, b] with the first bin closed, as pd.cut(include_lowest=True)
+    cut = pd.cut(pd.Series(values), edges, right=True, include_lowest=True).value_counts(sort=False)
+    assert index.histogram(edges, right=True).tolist() == cut.tolist()
+
+
+def test_build_indexes_derives_discount_pct():
+    df = pd.DataFrame({"manufacturer": ["A", "B", "A"], "price": [10.0, 20.0, 40.0],
+                       "discount_price": [9.0, 10.0, 40.0]})
+    index = build_indexes(df, ["discount_pct"])["discount_pct"]
+    assert index.sorted.tolist() == [0.0, 10.0, 50.0]
+    assert index.group_counts_above(5).to_dict() == {"A": 1, "B": 1}
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Columns that get a sorted threshold index
+INDEXED_COLUMNS = ["stock_level", "price", "avg_sentiment", "discount_pct"]
+
+
+# Sorted values of one column, overall and per group (manufacturer), so any
+# threshold or range count is a binary search instead of a full boolean mask.
+#
+# Per-group counts are answered for every group at once: each row is keyed as
+#   group_code * (n + 1) + global_rank
+# where global_rank is the number of values strictly below it. Keys sort by
+# group then value, and "value < t" is exactly "global_rank < rank(t)", so one
+# vectorised searchsorted over the keys gives the count below t in each group.
+class ThresholdIndex:
+    def __init__(self, values, groups):
+        values = np.asarray(values, dtype=float)
+        groups = np.asarray(groups)
+        keep = ~np.isnan(values)
+        values, groups = values[keep], groups[keep]
+
+        codes, names = pd.factorize(groups, sort=True)
+        self.groups = pd.Index(names, name="manufacturer")
+        self.sorted = np.sort(values)
+
+        n = len(values)
+        self.stride = n + 1
+        ranks = np.searchsorted(self.sorted, values, side="left")
+        self.group_keys = np.sort(codes.astype(np.int64) * self.stride + ranks)
+        self.group_base = np.arange(len(names), dtype=np.int64) * self.stride
+        self.group_starts = np.searchsorted(self.group_keys, self.group_base, side="left")
+        # Distinct values and where each starts in `sorted`, built on first use
+        self._distinct = None
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def min(self):
+        return self.sorted[0] if len(self.sorted) else np.nan
+
+    def max(self):
+        return self.sorted[-1] if len(self.sorted) else np.nan
+
+    def _rank(self, threshold, inclusive):
+        return np.searchsorted(self.sorted, threshold, side="right" if inclusive else "left")
+
+    # Number of values < threshold (<= when inclusive)
+    def count_below(self, threshold, inclusive=False):
+        return int(self._rank(threshold, inclusive))
+
+    # Number of values > threshold (>= when inclusive)
+    def count_above(self, threshold, inclusive=False):
+        return len(self.sorted) - self.count_below(threshold, inclusive=not inclusive)
+
+    # Number of values in [low, high)
+    def count_between(self, low, high):
+        return self.count_below(high) - self.count_below(low)
+
+    # Sorted values < threshold (a view, no copy)
+    def values_below(self, threshold, inclusive=False):
+        return self.sorted[:self.count_below(threshold, inclusive)]
+
+    # How many values equal each distinct value below threshold (<= when inclusive), as a
+    # Series indexed by value. Cost grows with the distinct values below it, not the rows.
+    def distinct_counts_below(self, threshold, inclusive=False):
+        if self._distinct is None:
+            # Already sorted: a distinct value starts wherever the value changes
+            starts = np.flatnonzero(np.diff(self.sorted, prepend=-np.inf) != 0)
+            self._distinct = self.sorted[starts], starts
+        values, starts = self._distinct
+        d = np.searchsorted(values, threshold, side="right" if inclusive else "left")
+        counts = np.diff(np.append(starts[:d], self._rank(threshold, inclusive)))
+        return pd.Series(counts, index=values[:d])
+
+    # Counts per bin edge pair. Bins are [a, b) with the last one open-ended,
+    # or (a, b] with the first one closed when right=True (like pd.cut include_lowest)
+    def histogram(self, edges, right=False):
+        edges = np.asarray(edges, dtype=float)
+        if right:
+            pos = np.searchsorted(self.sorted, edges, side="right")
+            pos[0] = np.searchsorted(self.sorted, edges[0], side="left")
+        else:
+            pos = np.searchsorted(self.sorted, edges, side="left")
+            pos[-1] = len(self.sorted)
+        return np.diff(pos)
+
+    # Per-group count of values < threshold (<= when inclusive), as a Series over all groups
+    def group_counts_below(self, threshold, inclusive=False):
+        rank = self._rank(threshold, inclusive)
+        below = np.searchsorted(self.group_keys, self.group_base + rank, side="left") - self.group_starts
+        return pd.Series(below, index=self.groups)
+
+    # Per-group count of values > threshold (>= when inclusive)
+    def group_counts_above(self, threshold, inclusive=False):
+        sizes = np.diff(np.append(self.group_starts, len(self.group_keys)))
+        return pd.Series(sizes, index=self.groups) - self.group_counts_below(threshold, inclusive=not inclusive)
+
+
+def build_indexes(df, columns=INDEXED_COLUMNS, group="manufacturer"):
+    indexes = {}
+    for column in columns:
+        if column == "discount_pct" and column not in df:
+            values = (df["price"] - df["discount_price"]) / df["price"] * 100
+        else:
+            values = df[column]
+        indexes[column] = ThresholdIndex(values.to_numpy(), df[group].to_numpy())
+    return indexes